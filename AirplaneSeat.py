@@ -8,6 +8,8 @@ Created on Wed Sep 23 09:51:32 2020
 
 import random
 
+import numpy as np
+
 
 def airplane_seat_simulation(num_passengers, num_seats=None):
     """Simulate seat assignment from classic probability problem.
@@ -44,22 +46,113 @@ def airplane_seat_simulation(num_passengers, num_seats=None):
     return pass_seat_pairings
         
 
-def airplane_simulation_statistics(num_trials, num_passengers=100, num_seats=100):
+def fast_airplane_seat_simulation(num_passengers, num_seats=None):
+    """Same simulation as airplane_seat_simulation, in O(num_seats) time.
+
+    Input/Output: as in airplane_seat_simulation
+
+    Free seats are kept in a pool list, with pool_index[seat] giving the
+    position of a seat in the pool (-1 once taken).  A seat is removed by
+    moving the last seat of the pool into its place, so checking and
+    taking a seat, or taking a random one, are all O(1).
+    """
+    if num_seats == None:
+        num_seats = num_passengers
+    if num_seats < num_passengers:
+        return None
+
+    pool = list(range(1, num_seats+1))
+    pool_index = [-1] + list(range(num_seats))
+
+    def take(i):
+        seat = pool[i]
+        last = pool.pop()
+        if last != seat:
+            pool[i] = last
+            pool_index[last] = i
+        pool_index[seat] = -1
+        return seat
+
+    pass_seat_pairings = [(1, take(random.randrange(len(pool))))]
+    for curr_person in range(2, num_passengers+1):
+        if curr_person <= num_seats and pool_index[curr_person] >= 0:
+            pass_seat_pairings.append((curr_person, take(pool_index[curr_person])))
+        else:
+            pass_seat_pairings.append((curr_person, take(random.randrange(len(pool)))))
+    return pass_seat_pairings
+
+
+def airplane_seat_batch(num_trials, num_passengers, num_seats=None, seed=None,
+                        max_cells=2**24):
+    """Run many independent airplane seat simulations at once with NumPy.
+
+    Input: num_trials, num_passengers, num_seats (int, optional-will default
+           to num_passengers), seed for np.random.default_rng, max_cells
+           (trials are done in batches of about max_cells/num_seats)
+    Output: boolean array of shape (num_trials, num_passengers), entry
+            [t, i] True if passenger i+1 got their own seat in trial t
+
+    Every trial has the same number of free seats at each step, so each
+    trial keeps a pool of free seats (row of a 2D array) with swap-remove
+    as in fast_airplane_seat_simulation, and one random index per trial
+    is drawn for the whole batch at once.
+    """
+    if num_seats == None:
+        num_seats = num_passengers
+    if num_seats < num_passengers:
+        return None
+    rng = np.random.default_rng(seed)
+    got_own_seat = np.zeros((num_trials, num_passengers), dtype=bool)
+    batch = max(1, min(num_trials, max_cells // num_seats))
+    for first in range(0, num_trials, batch):
+        trials = min(batch, num_trials - first)
+        rows = np.arange(trials)
+        # seats are 0,...,num_seats-1 here; passenger i+1 has seat i
+        pool = np.tile(np.arange(num_seats, dtype=np.int32), (trials, 1))
+        pool_index = pool.copy()
+        for i in range(num_passengers):
+            size = num_seats - i
+            index = rng.integers(0, size, trials)
+            if i > 0:
+                own = pool_index[:, i]
+                index = np.where(own >= 0, own, index)
+            seat = pool[rows, index]
+            last = pool[:, size-1].copy()
+            pool[rows, index] = last
+            pool_index[rows, last] = index
+            pool_index[rows, seat] = -1
+            got_own_seat[first:first+trials, i] = (seat == i)
+    return got_own_seat
+
+
+def airplane_simulation_statistics(num_trials, num_passengers=100, num_seats=100,
+                                   method="simple"):
     """Repeatedly run airplane_seat_simulation, return correct seat frequency.
     
     Return: list - (i-1)st entry = frequency ith passenger gets assigned seat.
     For frequency of last passenger getting correct seat, append [-1], ie
     airplane_simulation_statistics(num_trials)[-1]
+
+    method: "simple" uses airplane_seat_simulation, "fast" uses
+    fast_airplane_seat_simulation, "batch" uses airplane_seat_batch
+    (much faster for many trials or passengers).
     """
-    results = [ airplane_seat_simulation(num_passengers, num_seats) 
-               for n in range(num_trials) ]
-    num_correct_seat = [ sum([ results[trial][person][0]==results[trial][person][1] 
-                              for trial in range(num_trials)]) 
-                        for person in range(num_passengers) ]
+    if method == "batch":
+        got_own_seat = airplane_seat_batch(num_trials, num_passengers, num_seats)
+        return (got_own_seat.sum(axis=0) / num_trials).tolist()
+    if method not in ("simple", "fast"):
+        raise ValueError("method must be 'simple', 'fast' or 'batch'")
+    simulation = (airplane_seat_simulation if method == "simple"
+                  else fast_airplane_seat_simulation)
+    num_correct_seat = [0] * num_passengers
+    for trial in range(num_trials):
+        for person, seat in simulation(num_passengers, num_seats):
+            if person == seat:
+                num_correct_seat[person-1] += 1
     return [ num_correct_seat[i]/num_trials for i in range(num_passengers)]
     
 
 def random_pop(l):
     """Input list l. Removes and returns a random item from l."""
-    selection_num = random.choice(range(len(l)))
+    selection_num = random.randrange(len(l))
     return l.pop(selection_num)
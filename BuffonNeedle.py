@@ -5,88 +5,302 @@ Created on Mon Nov 30 14:06:11 2020
 
 @author: Corbett Redden
 """
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
 import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
 from numpy import pi, sin, cos
 
-# np.random.seed(1)  #Comment out when running actual simulations
-
-# Initial Parameters - These can be changed
-num_needles = 200
-needle_length = 1
-board_width = 1
-num_middle_boards = 3
-
-# New/Abbreviated variables, determined by above parameters
-r = needle_length/2  #radius - distance from needle midpoint
-theoretical_avg = (2*needle_length)/(board_width*pi)
-
-# Determine number boards to use
-long_needle = (needle_length > board_width)
-if not long_needle:  #short needle
-    x_board_low = 0
-    num_boards = num_middle_boards 
-    x_board_high = num_middle_boards * board_width
-if long_needle:
-    num_left_boards = int(r//board_width)
-    x_board_low = -num_left_boards * board_width
-    num_right_boards = int(r//board_width)
-    num_boards = num_left_boards + num_right_boards + num_middle_boards  
-    x_board_high = (num_middle_boards + num_right_boards)*board_width
-
-# Create x-values for lines between strips
-x_board = np.linspace(x_board_low, x_board_high, num_boards+1)
-
-# Determine bounds for needle midpoint. y-values could be adjusted
-x_needle_low = 0
-x_needle_high = num_middle_boards * board_width
-y_needle_low = x_needle_low # defaulted to square
-y_needle_high = x_needle_high # defaulted to square
-
-# Drop needles. x0 is needle midpoint, theta is angle of rotation in (-pi/2,pi/2)
-x0 = np.random.uniform(x_needle_low, x_needle_high, num_needles)
-y0 = np.random.uniform(y_needle_low, y_needle_high, num_needles)
-theta = np.random.uniform(-pi/2, pi/2, num_needles)
-
-# Left, right endpoints of needles
-xL = x0 - r*cos(theta)
-xR = x0 + r*cos(theta)
-yL = y0 - r*sin(theta)
-yR = y0 + r*sin(theta)
-
-# Calculate Intersections - row needle, column line
-cond1 = xL.reshape(num_needles,1) <= x_board.reshape(1,num_boards+1)
-cond2 = x_board.reshape(1,num_boards+1) <= xR.reshape(num_needles, 1)
-intersect = np.logical_and(cond1, cond2)
-
-# Associated calculations
-num_intersections = np.sum(intersect)
-avg_num_intersections = num_intersections / num_needles
-needle_intersect = np.any(intersect, axis=1)
-avg_num_needle_intersect = np.sum(needle_intersect) / num_needles
-
-# Graph
-# Determine graph bounds
-margin = .25*board_width
-x_graph_low = x_board_low - margin
-x_graph_high = x_board_high + margin
-y_graph_low = y_needle_low - margin
-y_graph_high = y_needle_high + margin
-# Graph boards
-for i in range(num_boards+1):
-    plt.plot([x_board[i], x_board[i]], [y_graph_low, y_graph_high], 
-             color="red")
-# Graph needles
-for i in range(num_needles):
-    needle_color = int(needle_intersect[i])*"blue" + int(not needle_intersect[i])*"grey"
-    plt.plot([xL[i], xR[i]], [yL[i], yR[i]], color=needle_color, linewidth=1)
-plt.xlim(x_graph_low, x_graph_high)
-plt.ylim(y_graph_low, y_graph_high)
-plt.axis(False)
-title1 = "Board width: "+str(board_width)+"    Needle length: "+str(needle_length)+ "    Needles: "+str(num_needles)
-title2 = "Average intersections: "+str(avg_num_intersections)+"     Theoretical: "+str(round(theoretical_avg,6))
-title3 = long_needle*("\nPercent of needles that cross line: "+str(avg_num_needle_intersect))
-plt.title(title1+"\n"+title2+title3)
-# plt.savefig("BuffonNeedlePic")
-plt.show()
 
+def board_lines(needle_length=1, board_width=1, num_middle_boards=3):
+    """
+    Input: needle and board dimensions, number of boards the needle
+        midpoints land on
+    Output: x-values of the lines between strips.  Extra boards are added
+        on each side for long needles, so every line a needle could
+        cross is included.
+    """
+    r = needle_length/2
+    long_needle = (needle_length > board_width)
+    if not long_needle:  #short needle
+        x_board_low = 0
+        num_boards = num_middle_boards 
+        x_board_high = num_middle_boards * board_width
+    if long_needle:
+        num_left_boards = int(r//board_width)
+        x_board_low = -num_left_boards * board_width
+        num_right_boards = int(r//board_width)
+        num_boards = num_left_boards + num_right_boards + num_middle_boards  
+        x_board_high = (num_middle_boards + num_right_boards)*board_width
+    return np.linspace(x_board_low, x_board_high, num_boards+1)
+
+
+def drop_needles(num_needles, needle_length=1, board_width=1,
+                 num_middle_boards=3, rng=None):
+    """
+    Drop needles with midpoints uniform on the square
+    [0, num_middle_boards*board_width]^2, angle uniform in (-pi/2,pi/2).
+    Input: number of needles, dimensions, numpy Generator (optional)
+    Output: xL, xR, yL, yR - left and right endpoints of needles
+    """
+    rng = (np.random.default_rng() if rng is None else rng)
+    r = needle_length/2
+    x_needle_high = num_middle_boards * board_width
+    x0 = rng.uniform(0, x_needle_high, num_needles)
+    y0 = rng.uniform(0, x_needle_high, num_needles)
+    theta = rng.uniform(-pi/2, pi/2, num_needles)
+    return x0 - r*cos(theta), x0 + r*cos(theta), y0 - r*sin(theta), y0 + r*sin(theta)
+
+
+def count_crossings(xL, xR, board_width=1):
+    """
+    Number of lines x = k*board_width (k an integer) with xL <= x <= xR,
+    for each needle.  Computed arithmetically, so memory is O(needles)
+    rather than O(needles x boards).
+    Input: arrays of left, right x-values of needles, board width
+    Output: integer array of number of crossings per needle
+    """
+    return (np.floor(xR/board_width) - np.ceil(xL/board_width) + 1).astype(np.int64)
+
+
+def _buffon_chunk(args):
+    """
+    Drop one chunk of needles with its own random stream.
+    Input: (size, seed_sequence, needle_length, board_width, num_middle_boards)
+    Output: (number of intersections, number of needles crossing a line,
+        sum of squared deviations of crossings from the chunk mean)
+    """
+    size, seed_seq, needle_length, board_width, num_middle_boards = args
+    rng = np.random.default_rng(seed_seq)
+    x0 = rng.uniform(0, num_middle_boards * board_width, size)
+    half = (needle_length/2)*cos(rng.uniform(-pi/2, pi/2, size))
+    crossings = count_crossings(x0 - half, x0 + half, board_width)
+    total = int(crossings.sum())
+    m2 = float(np.sum((crossings - total/size)**2))
+    return total, int(np.count_nonzero(crossings)), m2
+
+
+def buffon_chunks(num_needles, needle_length=1, board_width=1,
+                  num_middle_boards=3, chunk_size=10**6, seed=None,
+                  workers=None):
+    """
+    Generator of per-chunk counts (size, intersections, needle_intersect,
+    m2), in chunk order, where m2 is the sum of squared deviations of the
+    per-needle crossings from the chunk mean.  Chunk i always uses the
+    i-th child of np.random.SeedSequence(seed) (without spawning from a
+    given SeedSequence, so it can be reused), so the counts depend only
+    on seed and chunk_size - not on how many worker processes are used.
+    If workers > 1, chunks are run in a process pool, a few batches ahead.
+    """
+    if num_needles < 1 or chunk_size < 1:
+        raise ValueError("num_needles and chunk_size must be positive")
+    seed_seq = (seed if isinstance(seed, np.random.SeedSequence)
+                else np.random.SeedSequence(seed))
+    num_chunks = -(-num_needles // chunk_size)
+    params = (needle_length, board_width, num_middle_boards)
+
+    def tasks(first, last):
+        # child i is built directly (as spawn() would make it) rather than
+        # with spawn(), which would change the caller's SeedSequence
+        return [(min(chunk_size, num_needles - i*chunk_size),
+                 np.random.SeedSequence(seed_seq.entropy,
+                                        spawn_key=seed_seq.spawn_key + (i,),
+                                        pool_size=seed_seq.pool_size)) + params
+                for i in range(first, last)]
+
+    if workers is None or workers <= 1:
+        for i in range(num_chunks):
+            task = tasks(i, i+1)[0]
+            yield (task[0],) + _buffon_chunk(task)
+        return
+    batch = 4*workers
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for first in range(0, num_chunks, batch):
+            batch_tasks = tasks(first, min(first + batch, num_chunks))
+            for task, counts in zip(batch_tasks, pool.map(_buffon_chunk, batch_tasks)):
+                yield (task[0],) + counts
+
+
+def simulate_buffon(num_needles, needle_length=1, board_width=1,
+                    num_middle_boards=3, chunk_size=10**6, seed=None,
+                    workers=None):
+    """
+    Buffon's needle simulation in bounded memory: needles are dropped
+    chunk_size at a time and only the crossing counts are kept.  Only the
+    x-coordinates matter for crossings, so y-values aren't drawn.
+    Input: number of needles, needle length, board width, number of
+        boards the midpoints land on, needles per chunk, seed (int or
+        np.random.SeedSequence), number of worker processes
+    Output: dictionary of statistics
+        num_needles, num_intersections, avg_num_intersections,
+        num_needle_intersect (needles crossing at least one line),
+        avg_num_needle_intersect, theoretical_avg, seed (the entropy of
+        the SeedSequence, so a seed=None run can be repeated)
+    The same seed and chunk_size give identical results for any workers.
+    """
+    seed_seq = (seed if isinstance(seed, np.random.SeedSequence)
+                else np.random.SeedSequence(seed))
+    num_intersections = 0
+    num_needle_intersect = 0
+    for size, intersections, needle_intersect, m2 in buffon_chunks(
+            num_needles, needle_length, board_width, num_middle_boards,
+            chunk_size, seed_seq, workers):
+        num_intersections += intersections
+        num_needle_intersect += needle_intersect
+    return {"num_needles": num_needles,
+            "num_intersections": num_intersections,
+            "avg_num_intersections": num_intersections / num_needles,
+            "num_needle_intersect": num_needle_intersect,
+            "avg_num_needle_intersect": num_needle_intersect / num_needles,
+            "theoretical_avg": (2*needle_length)/(board_width*pi),
+            "seed": seed_seq.entropy}
+
+
+def merge_stats(n_a, mean_a, m2_a, n_b, mean_b, m2_b):
+    """
+    Combine (count, mean, sum of squared deviations) of two samples into
+    those of the union (Chan et al. parallel form of Welford's update).
+    """
+    n = n_a + n_b
+    delta = mean_b - mean_a
+    mean = mean_a + delta * n_b / n
+    m2 = m2_a + m2_b + delta**2 * n_a * n_b / n
+    return n, mean, m2
+
+
+def estimate_pi_buffon(rel_error=1e-3, confidence=.95, needle_length=1,
+                       board_width=1, num_middle_boards=3, chunk_size=10**6,
+                       max_needles=10**10, seed=None, workers=None,
+                       min_needles=10**4):
+    """
+    Estimate pi from pi = 2*needle_length/(board_width*E[crossings]),
+    dropping needles chunk by chunk until the confidence interval for pi
+    has relative half-width at most rel_error (or max_needles are used).
+    Running mean and variance of crossings per needle are merged chunk by
+    chunk (merge_stats); the normal-approximation interval for the mean
+    crossing rate is mapped to an interval for pi.
+    Input: target relative error, confidence level, dimensions, needles
+        per chunk, max number of needles, seed, number of worker processes,
+        min number of needles before stopping is allowed
+    Output: dictionary with num_needles, avg_num_intersections, variance,
+        rate_ci, pi_estimate, pi_ci, rel_error, converged, seed, and
+        trace - a list with one such dictionary (without trace) per chunk,
+        for plotting convergence
+    """
+    if not 0 < confidence < 1:
+        raise ValueError("confidence must be between 0 and 1")
+    z = NormalDist().inv_cdf((1 + confidence)/2)
+    scale = 2*needle_length/board_width
+    seed_seq = (seed if isinstance(seed, np.random.SeedSequence)
+                else np.random.SeedSequence(seed))
+    n, mean, m2 = 0, 0., 0.
+    trace = []
+    chunks = buffon_chunks(max_needles, needle_length, board_width,
+                           num_middle_boards, chunk_size, seed_seq, workers)
+    for size, intersections, needle_intersect, chunk_m2 in chunks:
+        n, mean, m2 = merge_stats(n, mean, m2, size, intersections/size, chunk_m2)
+        variance = (m2/(n-1) if n > 1 else 0.)
+        half_width = z*(variance/n)**.5
+        rate_ci = (mean - half_width, mean + half_width)
+        pi_ci = (scale/rate_ci[1],
+                 scale/rate_ci[0] if rate_ci[0] > 0 else float("inf"))
+        trace.append({"num_needles": n,
+                      "avg_num_intersections": mean,
+                      "variance": variance,
+                      "rate_ci": rate_ci,
+                      "pi_estimate": (scale/mean if mean > 0 else float("inf")),
+                      "pi_ci": pi_ci,
+                      "rel_error": (half_width/mean if mean > 0 else float("inf"))})
+        if n >= min_needles and trace[-1]["rel_error"] <= rel_error:
+            break
+    chunks.close()
+    result = dict(trace[-1])
+    result["converged"] = (result["rel_error"] <= rel_error)
+    result["seed"] = seed_seq.entropy
+    result["trace"] = trace
+    return result
+
+
+def render_buffon(xL, xR, yL, yR, needle_length=1, board_width=1,
+                  num_middle_boards=3, max_drawn=20000, rng=None, path=None,
+                  show=True):
+    """
+    Draw the boards and needles.  Statistics in the title use every
+    needle; if there are more than max_drawn needles, only a random
+    sample of max_drawn of them is drawn.  All needles are one
+    LineCollection (colored blue if crossing a line, grey otherwise).
+    Input: needle endpoints (eg from drop_needles), dimensions, max number
+        of needles to draw (None for all), numpy Generator for sampling,
+        path to save the image, whether to call plt.show()
+    Output: matplotlib Figure.  If path is given, the image is saved with
+        the Agg canvas and pyplot isn't used, so no display is needed.
+    """
+    num_needles = len(xL)
+    long_needle = (needle_length > board_width)
+    theoretical_avg = (2*needle_length)/(board_width*pi)
+    x_board = board_lines(needle_length, board_width, num_middle_boards)
+
+    # Statistics on all needles
+    intersect = count_crossings(xL, xR, board_width)
+    needle_intersect = (intersect > 0)
+    avg_num_intersections = np.sum(intersect) / num_needles
+    avg_num_needle_intersect = np.sum(needle_intersect) / num_needles
+
+    # Needles to draw
+    drawn = np.arange(num_needles)
+    if max_drawn is not None and num_needles > max_drawn:
+        rng = (np.random.default_rng() if rng is None else rng)
+        drawn = np.sort(rng.choice(num_needles, max_drawn, replace=False))
+    segments = np.stack([np.column_stack([xL[drawn], yL[drawn]]),
+                         np.column_stack([xR[drawn], yR[drawn]])], axis=1)
+    colors = np.where(needle_intersect[drawn, None],
+                      [0., 0., 1., 1.], [.5, .5, .5, 1.])
+
+    # Determine graph bounds
+    margin = .25*board_width
+    y_graph_low = 0 - margin
+    y_graph_high = num_middle_boards * board_width + margin
+
+    if path is None:
+        fig = plt.figure()
+    else:
+        fig = Figure()
+        FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.vlines(x_board, y_graph_low, y_graph_high, color="red")
+    ax.add_collection(LineCollection(segments, colors=colors, linewidths=1))
+    ax.set_xlim(x_board[0] - margin, x_board[-1] + margin)
+    ax.set_ylim(y_graph_low, y_graph_high)
+    ax.axis(False)
+    title1 = "Board width: "+str(board_width)+"    Needle length: "+str(needle_length)+ "    Needles: "+str(num_needles)
+    title2 = "Average intersections: "+str(avg_num_intersections)+"     Theoretical: "+str(round(theoretical_avg,6))
+    title3 = long_needle*("\nPercent of needles that cross line: "+str(avg_num_needle_intersect))
+    title4 = (len(drawn) < num_needles)*("\n(showing "+str(len(drawn))+" random needles)")
+    ax.set_title(title1+"\n"+title2+title3+title4)
+    fig.tight_layout()
+    if path is not None:
+        fig.savefig(path)
+    elif show:
+        plt.show()
+    return fig
+
+
+if __name__ == "__main__":
+    # np.random.seed(1)  #Comment out when running actual simulations
+
+    # Initial Parameters - These can be changed
+    num_needles = 200
+    needle_length = 1
+    board_width = 1
+    num_middle_boards = 3
+
+    # Drop needles, left and right endpoints
+    xL, xR, yL, yR = drop_needles(num_needles, needle_length, board_width,
+                                  num_middle_boards, np.random)
+
+    # Graph.  To save instead of display: path="BuffonNeedlePic.png"
+    render_buffon(xL, xR, yL, yR, needle_length, board_width,
+                  num_middle_boards, path=None)
@@ -29,9 +29,11 @@ allows you to rotate the bracelet or to turn it over.
 
 The number of such distinct necklaces/bracelets (ie the cardinarily of the
 "configuration space of anagrams" modulo cyclic/dihedral group)
-is computed by brute force in this code.  The functions return the c
-cardinality by default, but they can also return a set of representatives
-or the entire cosets.
+is computed with Burnside's lemma by default, which works directly from
+the partition and never lists the permutations.  The brute force count
+is still available (method="brute") as a cross-check.  The functions
+return the cardinality by default, but they can also return a set of
+representatives or the entire cosets.
 
 eg 
 >>> partition_tuple = (2, 3, 1)
@@ -44,11 +46,21 @@ eg
 # 'necklaces' and 'bracelets' only exist for notational ease, as they
 # both call 'configs_count'.
     
+from ast import literal_eval
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import csv
+from math import comb, gcd
+from operator import itemgetter
+import os
+import shelve
+import numpy as np
 from sympy.utilities.iterables import multiset_permutations
 # import itertools
 
 
-def necklaces(partition_tuple, output='num'):
+def necklaces(partition_tuple, output='num', method="burnside", cache=True,
+              coset_format="sets"):
     """
     Determine the necklaces of a given partition.
     
@@ -56,24 +68,41 @@ def necklaces(partition_tuple, output='num'):
         partition_tuple : tuple
             eg (2, 2, 1) to represent 2+2+1=5, [a,a,b,b,c]
         output : {'num', 'reps', 'cosets'}, optional
+        method : {"burnside", "brute"}, optional
+            how to count when output=='num' (see configs_count)
+        cache : bool, optional
+            look up / store the result in configs_cache (see ConfigsCache).
+            method="brute" always recomputes, since it is a cross-check.
+        coset_format : {"sets", "arrays"}, optional
+            format of the cosets when output=='cosets'
 
     Output: 
         if output=='num', returns number of necklaces
-        if output=='reps', returns a list of necklaces (representatives)
-        if output=='cosets', return list of cosets        
+        if output=='reps', returns a list of necklaces (representatives),
+            each the lexicographically least rotation (see iter_necklaces)
+        if output=='cosets', return list of cosets, or with
+            coset_format="arrays" the (configs, offsets) arrays described
+            in cosets_to_arrays (these are not cached)
     """
+    if cache and method != "brute" and output in {'num', 'reps', 'cosets'} \
+            and not (output == 'cosets' and coset_format == "arrays"):
+        return configs_cache.lookup(partition_tuple, "Cn", output,
+            lambda: necklaces(partition_tuple, output, method, cache=False))
+
     if output=='num':
-        return configs_count(partition_tuple, group="Cn", return_cosets=False)
+        return configs_count(partition_tuple, group="Cn", return_cosets=False,
+                             method=method)
     
     if output=='cosets':
-        return configs_count(partition_tuple, group="Cn", return_cosets=True)
+        return configs_count(partition_tuple, group="Cn", return_cosets=True,
+                             coset_format=coset_format)
     
     if output=='reps':
-        cosets = configs_count(partition_tuple, group="Cn", return_cosets=True)
-        return [ x.pop() for x in cosets]
+        return list(iter_necklaces(partition_tuple))
 
 
-def bracelets(partition_tuple, output='num'):
+def bracelets(partition_tuple, output='num', method="burnside", cache=True,
+              coset_format="sets"):
     """
     Determine the bracelets of a given partition.
     
@@ -81,24 +110,275 @@ def bracelets(partition_tuple, output='num'):
         partition_tuple : tuple
             eg (2, 2, 1) to represent 2+2+1=5, [a,a,b,b,c]
         output : {'num', 'reps', 'cosets'}, optional
+        method : {"burnside", "brute"}, optional
+            how to count when output=='num' (see configs_count)
+        cache : bool, optional
+            look up / store the result in configs_cache (see ConfigsCache).
+            method="brute" always recomputes, since it is a cross-check.
+        coset_format : {"sets", "arrays"}, optional
+            format of the cosets when output=='cosets'
 
     Output: 
         if output=='num', returns number of bracelets
-        if output=='reps', returns a list of bracelets (representatives)
-        if output=='cosets', return list of cosets        
+        if output=='reps', returns a list of bracelets (representatives),
+            each the lexicographically least in its class (see iter_bracelets)
+        if output=='cosets', return list of cosets, or with
+            coset_format="arrays" the (configs, offsets) arrays described
+            in cosets_to_arrays (these are not cached)
     """
+    if cache and method != "brute" and output in {'num', 'reps', 'cosets'} \
+            and not (output == 'cosets' and coset_format == "arrays"):
+        return configs_cache.lookup(partition_tuple, "Dn", output,
+            lambda: bracelets(partition_tuple, output, method, cache=False))
+
     if output=='num':
-        return configs_count(partition_tuple, group="Dn", return_cosets=False)
+        return configs_count(partition_tuple, group="Dn", return_cosets=False,
+                             method=method)
     
     if output=='cosets':
-        return configs_count(partition_tuple, group="Dn", return_cosets=True)
+        return configs_count(partition_tuple, group="Dn", return_cosets=True,
+                             coset_format=coset_format)
     
     if output=='reps':
-        cosets = configs_count(partition_tuple, group="Dn", return_cosets=True)
-        return [ x.pop() for x in cosets]
+        return list(iter_bracelets(partition_tuple))
+
+
+class ConfigsCache:
+    """
+    Memoize results of necklaces()/bracelets().
+
+    Counts don't depend on the order of the parts, eg (2, 3, 1) and
+    (1, 2, 3) have the same number of necklaces, so counts are keyed by
+    the sorted nonzero parts.  Representatives and cosets are written in
+    the labels of the given partition, so they are keyed by the partition
+    exactly as given.
+
+    Results are kept in an in-process LRU, bounded both by the number of
+    entries (maxsize) and by the total number of stored configurations
+    (max_items; a count is 1 item, a list of reps is its length, and a
+    list of cosets is the total size of its cosets).
+    If path is given (or open_store is called), results are also written
+    to a shelve file there, so they survive restarts.
+
+    necklaces and bracelets use the module-level configs_cache; eg
+    configs_cache.open_store("configs_cache.db") keeps their results.
+
+    Example:
+    >>> import os, tempfile
+    >>> cache = ConfigsCache(path=os.path.join(tempfile.mkdtemp(), "configs.db"))
+    >>> cache.lookup((2, 3, 1), "Cn", "num", lambda: necklaces((2, 3, 1), cache=False))
+    10
+    >>> # same sorted partition, so a cache hit
+    >>> cache.lookup((1, 2, 3), "Cn", "num", lambda: necklaces((1, 2, 3), cache=False))
+    10
+    >>> cache.stats()
+    {'hits': 1, 'disk_hits': 0, 'misses': 1, 'entries': 1, 'items': 1}
+    >>> cache.close_store()
+    """
+
+    def __init__(self, maxsize=1024, max_items=10**6, path=None):
+        self.maxsize = maxsize
+        self.max_items = max_items
+        self.entries = OrderedDict()  # key -> (value, num_items)
+        self.items = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.store = None
+        if path is not None:
+            self.open_store(path)
+
+    def open_store(self, path):
+        """Use (or create) the on-disk shelve store at path"""
+        self.close_store()
+        self.store = shelve.open(path)
+
+    def close_store(self):
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+    @staticmethod
+    def key(partition_tuple, group, output):
+        if output == 'num':
+            return (output, group, tuple(sorted(p for p in partition_tuple if p > 0)))
+        return (output, group, tuple(partition_tuple))
+
+    def lookup(self, partition_tuple, group, output, compute):
+        """Return cached result, or call compute() and cache its result"""
+        key = self.key(partition_tuple, group, output)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self._copy(self.entries[key][0])
+        if self.store is not None and repr(key) in self.store:
+            self.disk_hits += 1
+            value = self.store[repr(key)]
+        else:
+            self.misses += 1
+            value = compute()
+            if self.store is not None:
+                self.store[repr(key)] = value
+        self._remember(key, value)
+        return self._copy(value)
+
+    def _remember(self, key, value):
+        if key[0] == 'cosets':
+            num_items = sum(len(coset) for coset in value)
+        else:
+            num_items = (1 if isinstance(value, int) else len(value))
+        if num_items > self.max_items:
+            return
+        self.entries[key] = (value, num_items)
+        self.items += num_items
+        while len(self.entries) > self.maxsize or self.items > self.max_items:
+            _, (_, old_items) = self.entries.popitem(last=False)
+            self.items -= old_items
+
+    @staticmethod
+    def _copy(value):
+        # callers may modify the returned list (or the sets of cosets)
+        if isinstance(value, int):
+            return value
+        return [ (set(x) if isinstance(x, set) else x) for x in value ]
+
+    def invalidate(self, partition_tuple=None, group=None):
+        """
+        Remove cached results, from memory and disk.  With no arguments
+        everything is removed; otherwise only entries matching the given
+        partition (in any of its key forms) and/or group.
+        """
+        keys = set(self.entries)
+        if self.store is not None:
+            keys |= { literal_eval(k) for k in self.store.keys() }
+        if partition_tuple is not None:
+            num_parts = self.key(partition_tuple, group, 'num')[2]
+            keys = { k for k in keys if
+                     (k[2] == num_parts if k[0] == 'num'
+                      else k[2] == tuple(partition_tuple)) }
+        if group is not None:
+            keys = { k for k in keys if k[1] == group }
+        for k in keys:
+            if k in self.entries:
+                self.items -= self.entries.pop(k)[1]
+            if self.store is not None and repr(k) in self.store:
+                del self.store[repr(k)]
+
+    def stats(self):
+        """Hit/miss statistics and current size of the in-process cache"""
+        return {'hits': self.hits, 'disk_hits': self.disk_hits,
+                'misses': self.misses, 'entries': len(self.entries),
+                'items': self.items}
+
+
+configs_cache = ConfigsCache()
+
+
+def iter_necklaces(partition_tuple):
+    """
+    Lazily yield the necklaces of a partition, one at a time.
+
+    Each necklace is yielded as its canonical representative, the
+    lexicographically least of its rotations, in increasing lex order.
+    Uses the fixed-content necklace algorithm of Ruskey and Sawada, which
+    builds prenecklaces one bead at a time and never looks at the other
+    permutations, so memory is O(n) however many necklaces there are.
+
+    >>> list(iter_necklaces((2, 2)))
+    [(0, 0, 1, 1), (0, 1, 0, 1)]
+    """
+    labels = [i for i, p in enumerate(partition_tuple) if p > 0]
+    remaining = [partition_tuple[i] for i in labels]
+    k = len(remaining)
+    n = sum(remaining)
+    if n == 0:
+        yield ()
+        return
+
+    # a[1..n] is the prenecklace, a[0] is unused; the smallest bead
+    # always comes first.  Level t tries bead values j >= a[t-p], where
+    # p is the length of the longest Lyndon prefix of a[1..t-1].
+    a = [0] * (n+2)
+    p_at = [0] * (n+2)
+    j_at = [0] * (n+2)
+    a[1] = 0
+    remaining[0] -= 1
+    t = 2
+    p_at[t] = 1
+    j_at[t] = a[t-1]
+    while t >= 2:
+        if t > n:
+            if n % p_at[t] == 0:
+                yield tuple(labels[x] for x in a[1:n+1])
+            t -= 1
+            remaining[a[t]] += 1
+            j_at[t] = a[t] + 1
+            continue
+        j = j_at[t]
+        while j < k and remaining[j] == 0:
+            j += 1
+        if j >= k:
+            t -= 1
+            if t >= 2:
+                remaining[a[t]] += 1
+                j_at[t] = a[t] + 1
+            continue
+        a[t] = j
+        remaining[j] -= 1
+        p = p_at[t]
+        t += 1
+        p_at[t] = (p if j == a[t-1-p] else t-1)
+        j_at[t] = a[t - p_at[t]]
+
+
+def iter_bracelets(partition_tuple):
+    """
+    Lazily yield the bracelets of a partition, one at a time.
+
+    A necklace is the canonical (lexicographically least) representative
+    of its bracelet exactly when it is <= the least rotation of its
+    reversal, so this filters iter_necklaces with one O(n) check each.
+
+    >>> list(iter_bracelets((2, 3, 1)))  # doctest: +NORMALIZE_WHITESPACE
+    [(0, 0, 1, 1, 1, 2), (0, 0, 1, 1, 2, 1), (0, 1, 0, 1, 1, 2),
+     (0, 1, 0, 1, 2, 1), (0, 1, 1, 0, 1, 2), (0, 1, 1, 1, 0, 2)]
+    """
+    for necklace in iter_necklaces(partition_tuple):
+        reverse = necklace[::-1]
+        i = least_rotation(reverse)
+        if necklace <= reverse[i:] + reverse[:i]:
+            yield necklace
 
 
-def configs_count(partition_tuple, group="Cn", return_cosets=False):
+def least_rotation(x):
+    """
+    Return index i such that x[i:] + x[:i] is the lexicographically
+    least rotation of x, using Booth's O(n) algorithm.
+
+    >>> least_rotation((1, 0, 1, 0, 0))
+    3
+    """
+    n = len(x)
+    failure = [-1] * (2*n)
+    k = 0
+    for j in range(1, 2*n):
+        xj = x[j % n]
+        i = failure[j-k-1]
+        while i != -1 and xj != x[(k+i+1) % n]:
+            if xj < x[(k+i+1) % n]:
+                k = j-i-1
+            i = failure[i]
+        if i == -1 and xj != x[(k+i+1) % n]:
+            if xj < x[(k+i+1) % n]:
+                k = j
+            failure[j-k] = -1
+        else:
+            failure[j-k] = i+1
+    return k
+
+
+def configs_count(partition_tuple, group="Cn", return_cosets=False,
+                  method="burnside", coset_format="sets"):
     """
     Given partition, calculate the number of multiset permutations
     (ie anagrams) modulo cyclic rotations (group="Cn")
@@ -107,18 +387,276 @@ def configs_count(partition_tuple, group="Cn", return_cosets=False):
     Input:
         partition_tuple : tuple
             eg (2, 2, 1) to represent 2+2+1=5, [a,a,b,b,c]
-        group : "Cn" or "Dn" for cyclic/dihedral group
+        group : "Cn" or "Dn" for cyclic/dihedral group, or a list of
+            generator permutations (see mod_group_generators)
         return_cosets : bool
             False : only return cardinality
             True : return list of quotient set elems
+        method : "burnside" or "brute"
+            "burnside" : count with burnside_count (cardinality only)
+            "brute" : list every permutation and reduce mod group
+            The cosets can only be found by brute force, so
+            return_cosets=True always uses "brute", as do groups
+            given by generators.
+        coset_format : "sets" or "arrays" (see mod_group)
     Output: 
         cardinality (or set) of configurations modulo symmetry
     """
+    if method not in {"burnside", "brute"}:
+        raise ValueError("method must be 'burnside' or 'brute'")
+    if method == "burnside" and not return_cosets and isinstance(group, str):
+        return burnside_count(partition_tuple, group)
     attendees = multiset_tuple(partition_tuple)
     configs_iter = multiset_permutations(attendees)
-    configs = { tuple(x) for x in configs_iter }
+    # multiset_permutations never repeats, so the configs can be streamed
+    # straight into the canonical-form reduction without building a set;
+    # all permutations of a multiset are closed under the group
+    configs = ( pack_config(x) for x in configs_iter )
     # configs = set(itertools.permutations(attendees))
-    return mod_group(configs, group, return_cosets)
+    return mod_group(configs, group, return_cosets, coset_format=coset_format,
+                     closed=True)
+
+
+def burnside_count(partition_tuple, group="Cn"):
+    """
+    Count necklaces (group="Cn") or bracelets (group="Dn") of a partition
+    using Burnside's lemma: the number of orbits is the average, over the
+    group, of the number of configurations fixed by each group element.
+
+    A rotation by i splits the n beads into gcd(i, n) cycles of length
+    d = n/gcd(i, n), and a configuration is fixed exactly when each cycle
+    has a single colour.  That is only possible if d divides every part,
+    so only the divisors d of gcd(partition_tuple) contribute, and there
+    are phi(d) rotations with cycles of length d:
+        necklaces = (1/n) sum_{d | gcd} phi(d) * multinomial(p_1/d, ..., p_k/d)
+    Reflections in Dn split the beads into 2-cycles and 0, 1 or 2 fixed
+    beads, which only leaves a few parity cases to count.
+    Everything uses exact integer arithmetic, so there is no rounding
+    even for very large n.
+
+    >>> burnside_count((10, 10, 10), "Cn")
+    185033251616
+    """
+    if group not in {"Cn", "Dn"}:
+        raise ValueError("group must be 'Cn' or 'Dn'")
+    parts = [p for p in partition_tuple if p > 0]
+    n = sum(parts)
+    if n == 0:
+        return 1
+
+    # Rotations: sum of fixed points over all n rotations
+    g = 0
+    for p in parts:
+        g = gcd(g, p)
+    rotation_total = 0
+    for d in divisors(g):
+        rotation_total += euler_phi(d) * multinomial([p//d for p in parts])
+    if group == "Cn":
+        return rotation_total // n
+
+    # Reflections: sum of fixed points over all n reflections
+    odd_parts = [i for i, p in enumerate(parts) if p % 2 == 1]
+    half_parts = [p//2 for p in parts]
+    reflection_total = 0
+    if n % 2 == 1:
+        # n reflections, each fixing one bead and swapping (n-1)/2 pairs
+        if len(odd_parts) == 1:
+            reflection_total = n * multinomial(half_parts)
+    else:
+        # n/2 reflections fix no beads and swap n/2 pairs
+        if len(odd_parts) == 0:
+            reflection_total += (n//2) * multinomial(half_parts)
+        # n/2 reflections fix two beads and swap (n-2)/2 pairs
+        if len(odd_parts) == 0:
+            # both fixed beads have the same colour
+            fixed = 0
+            for i, p in enumerate(parts):
+                if p >= 2:
+                    half_parts[i] -= 1
+                    fixed += multinomial(half_parts)
+                    half_parts[i] += 1
+            reflection_total += (n//2) * fixed
+        elif len(odd_parts) == 2:
+            # the fixed beads are the two odd colours, in either order
+            reflection_total += (n//2) * 2 * multinomial(half_parts)
+    return (rotation_total + reflection_total) // (2*n)
+
+
+def multinomial(parts):
+    """
+    Exact multinomial coefficient (p_1 + ... + p_k)! / (p_1! ... p_k!)
+    >>> multinomial((2, 3, 1))
+    60
+    """
+    total = 0
+    product = 1
+    for p in parts:
+        total += p
+        product *= comb(total, p)
+    return product
+
+
+def divisors(n):
+    """Return sorted list of positive divisors of n"""
+    small, large = [], []
+    d = 1
+    while d*d <= n:
+        if n % d == 0:
+            small.append(d)
+            if d*d != n:
+                large.append(n//d)
+        d += 1
+    return small + large[::-1]
+
+
+def euler_phi(n):
+    """Euler's totient: number of 1 <= k <= n with gcd(k, n) == 1"""
+    result = n
+    p = 2
+    while p*p <= n:
+        if n % p == 0:
+            while n % p == 0:
+                n //= p
+            result -= result // p
+        p += 1
+    if n > 1:
+        result -= result // n
+    return result
+
+
+def integer_partitions(n):
+    """
+    Yield the partitions of n as non-increasing tuples, in reverse
+    lexicographic order.
+    >>> list(integer_partitions(4))
+    [(4,), (3, 1), (2, 2), (2, 1, 1), (1, 1, 1, 1)]
+    """
+    if n == 0:
+        yield ()
+        return
+    parts = [n]
+    while True:
+        yield tuple(parts)
+        # find the rightmost part > 1, decrease it, and refill after it
+        ones = 0
+        while parts and parts[-1] == 1:
+            parts.pop()
+            ones += 1
+        if not parts:
+            return
+        largest = parts.pop() - 1
+        remainder = ones + 1
+        while remainder > largest:
+            parts.append(largest)
+            remainder -= largest
+        parts.append(largest)
+        if remainder:
+            parts.append(remainder)
+
+
+def tabulate_configs(n_max, groups=("Cn", "Dn"), path=None, n_min=1,
+                     method="burnside", workers=None):
+    """
+    Tabulate configs_count for every partition of every n_min <= n <= n_max.
+
+    Input:
+        n_max, n_min : int
+        groups : tuple of "Cn"/"Dn", one column per group
+        path : str, optional
+            If given, rows are streamed to this file as they are computed:
+            Parquet if it ends in ".parquet" (needs pyarrow), else CSV.
+        method : "burnside" or "brute", passed to configs_count
+        workers : int, optional
+            number of worker processes (default os.cpu_count());
+            workers=1 computes everything in this process
+    Output:
+        list of rows (n, partition, permutations, count for each group)
+        if path is None, otherwise the number of rows written
+
+    The partitions are split into contiguous chunks of roughly equal
+    estimated cost (the multinomial, ie the number of permutations, for
+    method="brute") and handed to a process pool.  Chunks are collected
+    in submission order, so the output is the same however the workers
+    are scheduled.
+    """
+    groups = tuple(groups)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    partitions = [ p for n in range(n_min, n_max+1)
+                   for p in integer_partitions(n) ]
+    chunks = _cost_chunks(partitions, method, 4*workers)
+    args = [ (chunk, groups, method) for chunk in chunks ]
+    if workers == 1:
+        row_chunks = map(_tabulate_chunk, args)
+        return _write_rows(row_chunks, groups, path)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        row_chunks = executor.map(_tabulate_chunk, args)
+        return _write_rows(row_chunks, groups, path)
+
+
+def _estimated_cost(partition_tuple, method):
+    if method == "brute":
+        return multinomial(partition_tuple)
+    return len(partition_tuple) + 1
+
+
+def _cost_chunks(partitions, method, num_chunks):
+    """Split list into contiguous chunks of about total_cost/num_chunks"""
+    costs = [ _estimated_cost(p, method) for p in partitions ]
+    target = max(sum(costs) / max(num_chunks, 1), 1)
+    chunks, chunk, chunk_cost = [], [], 0
+    for p, cost in zip(partitions, costs):
+        chunk.append(p)
+        chunk_cost += cost
+        if chunk_cost >= target:
+            chunks.append(chunk)
+            chunk, chunk_cost = [], 0
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def _tabulate_chunk(args):
+    """Worker for tabulate_configs: rows for one chunk of partitions"""
+    chunk, groups, method = args
+    return [ (sum(p), p, multinomial(p)) +
+             tuple(configs_count(p, g, method=method) for g in groups)
+             for p in chunk ]
+
+
+def _write_rows(row_chunks, groups, path):
+    """Collect rows from iterable of chunks, or stream them to path"""
+    header = ["n", "partition", "permutations"] + list(groups)
+    if path is None:
+        return [ row for rows in row_chunks for row in rows ]
+
+    num_rows = 0
+    if str(path).endswith(".parquet"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        # counts are stored as strings, since they can exceed int64
+        schema = pa.schema([("n", pa.int64()), ("partition", pa.string())] +
+                           [(name, pa.string()) for name in header[2:]])
+        with pq.ParquetWriter(path, schema) as writer:
+            for rows in row_chunks:
+                columns = list(zip(*rows))
+                arrays = [list(columns[0]), [" ".join(map(str, p)) for p in columns[1]]]
+                arrays += [ [str(x) for x in col] for col in columns[2:] ]
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(a, type=t.type) for a, t in zip(arrays, schema)],
+                    schema=schema))
+                num_rows += len(rows)
+        return num_rows
+
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(header)
+        for rows in row_chunks:
+            for row in rows:
+                writer.writerow((row[0], " ".join(map(str, row[1]))) + row[2:])
+            file.flush()
+            num_rows += len(rows)
+    return num_rows
 
 
 def multiset_tuple(partition_tuple):
@@ -135,20 +673,102 @@ def multiset_tuple(partition_tuple):
     return tuple(elem_list)
 
 
-def mod_group(orig_set, group, return_cosets=False, inplace=False):
+def pack_config(x):
+    """
+    Store configuration x compactly: as bytes if every label fits in a
+    byte (much smaller than a tuple of ints), otherwise as a tuple.
+    >>> pack_config([0, 0, 1, 2])
+    b'\\x00\\x00\\x01\\x02'
+    """
+    try:
+        return bytes(x)
+    except ValueError:
+        return tuple(x)
+
+
+def canonical_form(x, group):
+    """
+    Return the canonical representative of the orbit of x: its least
+    rotation (group="Cn"), or the least of the least rotations of x and
+    of reversed x (group="Dn").  Two configurations are in the same orbit
+    exactly when they have the same canonical form.  O(n) via Booth.
+    x can be a tuple or bytes, and the result has the same type.
+    """
+    if group not in {"Cn", "Dn"}:
+        raise ValueError("group must be 'Cn' or 'Dn'")
+    if isinstance(x, bytes) and 0 < len(x) <= 1024:
+        return _canonical_bytes(x, group)
+    i = least_rotation(x)
+    key = x[i:] + x[:i]
+    if group == "Dn":
+        reverse = x[::-1]
+        i = least_rotation(reverse)
+        key = min(key, reverse[i:] + reverse[:i])
+    return key
+
+
+def _canonical_bytes(x, group):
+    """
+    canonical_form for short bytes.  The least rotation must start with
+    the smallest label, so only those rotations are compared; for short
+    configurations this C-level slicing is much faster than Booth's loop.
+    """
+    n = len(x)
+    smallest = bytes((min(x),))
+    best = x
+    for xx in ((x+x, (x+x)[::-1]) if group == "Dn" else (x+x,)):
+        i = xx.find(smallest)
+        while i < n:
+            rotation = xx[i:i+n]
+            if rotation < best:
+                best = rotation
+            i = xx.find(smallest, i+1)
+    return best
+
+
+def mod_group(orig_set, group, return_cosets=False, inplace=False,
+              reduction="canonical", coset_format="sets", closed=False):
     """ 
     Input:
         orig_set : set, where each element is an iterable
             (assumed to be of same length)
-        group : "Cn" or "Dn" for cyclic/dihedral group
+            For reduction="canonical" this may be any iterable of
+            distinct configurations, eg a generator.
+        group : "Cn" or "Dn" for cyclic/dihedral group, or a list of
+            generator permutations (see mod_group_generators)
         return_cosets : bool
             False : only return cardinality
             True : return list of quotient set elems
         inplace : bool
             False : orig_set is not modified
+        reduction : "canonical", "orbit" or "unionfind"
+            "canonical" : one pass, grouping elements by canonical_form
+            "orbit" : repeatedly remove the whole orbit of an element
+            "unionfind" : join elements along the group generators
+            Groups given by generators always use "unionfind".
+        coset_format : "sets" or "arrays"
+            "sets" : cosets are returned as a list of sets of tuples
+            "arrays" : cosets are returned as (configs, offsets) arrays,
+                see cosets_to_arrays
+        closed : bool
+            True if orig_set is known to be closed under the group (eg
+            all permutations of a multiset); allows a faster count for
+            reduction="canonical", see mod_group_canonical
     Output: 
         cardinality (or set) of orig_set (configs) modulo symmetry
     """
+    if coset_format not in {"sets", "arrays"}:
+        raise ValueError("coset_format must be 'sets' or 'arrays'")
+    if not isinstance(group, str) or reduction == "unionfind":
+        result = mod_group_generators(orig_set, group, return_cosets)
+        if return_cosets and coset_format == "arrays":
+            return cosets_to_arrays(result)
+        return result
+    if reduction == "canonical":
+        return mod_group_canonical(orig_set, group, return_cosets, coset_format,
+                                   closed)
+    if reduction != "orbit":
+        raise ValueError("reduction must be 'canonical', 'orbit' or 'unionfind'")
     # sets are mutable, so make a copy if we don't want to eventually delete all elements from input set
     big_set = (orig_set if inplace else orig_set.copy())
 
@@ -171,20 +791,224 @@ def mod_group(orig_set, group, return_cosets=False, inplace=False):
         big_set -= orbit
 
     if return_cosets:
+        if coset_format == "arrays":
+            return cosets_to_arrays(quotient_list)
         return quotient_list
     else:
         return quotient_size
 
 
+def mod_group_canonical(configs, group, return_cosets=False, coset_format="sets",
+                        closed=False):
+    """
+    Single pass version of mod_group: each configuration is packed
+    (pack_config) and keyed by its canonical_form, so no orbits are built.
+    Returns the number of orbits, or the cosets (as a list of sets of
+    tuples, or as arrays if coset_format="arrays").
+
+    When only counting and configs is closed under the group (closed=True,
+    eg all permutations of a multiset), byte-packed configurations are
+    not even keyed: by the orbit-stabilizer theorem each x contributes |Stab(x)|/|G| to
+    the number of orbits, and |Stab(x)| comes from two substring searches
+    in x+x (its period, and whether reversed x is a rotation of x).
+    Nothing is stored, so memory does not grow with the number of configs.
+    Otherwise orbits may be only partly present, so canonical forms are
+    counted.
+    """
+    if group not in {"Cn", "Dn"}:
+        raise ValueError("group must be 'Cn' or 'Dn'")
+    if not return_cosets and not closed:
+        return len({ canonical_form(pack_config(x), group) for x in configs })
+    if not return_cosets:
+        stabilizer_total = 0
+        n = 0
+        keys = set()  # configurations that don't fit in bytes
+        for x in configs:
+            x = pack_config(x)
+            if isinstance(x, bytes) and x:
+                n = len(x)
+                xx = x + x
+                stabilizer = n // xx.find(x, 1)
+                if group == "Dn" and xx.find(x[::-1]) != -1:
+                    stabilizer *= 2
+                stabilizer_total += stabilizer
+            else:
+                keys.add(canonical_form(x, group))
+        if stabilizer_total:
+            group_order = (n if group == "Cn" else 2*n)
+            return stabilizer_total // group_order + len(keys)
+        return len(keys)
+
+    cosets = dict()  # canonical form -> list of packed configurations
+    for x in configs:
+        x = pack_config(x)
+        key = canonical_form(x, group)
+        if key in cosets:
+            cosets[key].append(x)
+        else:
+            cosets[key] = [x]
+    if coset_format == "arrays":
+        return cosets_to_arrays(cosets.values())
+    return [ { tuple(x) for x in coset } for coset in cosets.values() ]
+
+
+def cosets_to_arrays(cosets):
+    """
+    Store cosets compactly, CSR style.
+
+    Input:
+        cosets : iterable of cosets, each an iterable of configurations
+            (tuples or packed bytes) of the same length n
+    Output:
+        configs : 2-D array of shape (number of configurations, n),
+            dtype uint8 if every label is < 256, else uint16
+            (uint32 if needed), with the cosets one after another
+        offsets : 1-D int64 array of length (number of cosets + 1);
+            coset i is configs[offsets[i]:offsets[i+1]]
+
+    >>> configs, offsets = cosets_to_arrays(necklaces((2, 2), 'cosets'))
+    >>> offsets
+    array([0, 4, 6])
+    """
+    cosets = [ list(coset) for coset in cosets ]
+    offsets = np.zeros(len(cosets)+1, dtype=np.int64)
+    np.cumsum([ len(coset) for coset in cosets ], out=offsets[1:])
+    members = [ x for coset in cosets for x in coset ]
+    if not members:
+        return np.zeros((0, 0), dtype=np.uint8), offsets
+    n = len(members[0])
+    if all(isinstance(x, bytes) for x in members):
+        configs = np.frombuffer(b"".join(members), dtype=np.uint8)
+        return configs.reshape(len(members), n).copy(), offsets
+    configs = np.array([ tuple(x) for x in members ]).reshape(len(members), n)
+    largest = (int(configs.max()) if configs.size else 0)
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if largest <= np.iinfo(dtype).max:
+            return configs.astype(dtype), offsets
+    return configs, offsets
+
+
+def save_coset_arrays(prefix, configs, offsets):
+    """Save arrays from cosets_to_arrays as prefix_configs.npy, prefix_offsets.npy"""
+    np.save(str(prefix) + "_configs.npy", configs)
+    np.save(str(prefix) + "_offsets.npy", offsets)
+
+
+def load_coset_arrays(prefix, mmap_mode="r"):
+    """
+    Load (configs, offsets) saved by save_coset_arrays.  By default the
+    arrays are memory-mapped read-only, so nothing is read into memory
+    until it is used; pass mmap_mode=None to load them fully.
+    """
+    configs = np.load(str(prefix) + "_configs.npy", mmap_mode=mmap_mode)
+    offsets = np.load(str(prefix) + "_offsets.npy", mmap_mode=mmap_mode)
+    return configs, offsets
+
+
+def mod_group_generators(configs, generators, return_cosets=False):
+    """
+    Version of mod_group for a group given only by generators.
+
+    Input:
+        configs : iterable of distinct configurations of length n,
+            closed under the group
+        generators : list of permutations g of range(n), acting by
+            (g.x)[i] = x[g[i]]; or "Cn"/"Dn" (see group_generators)
+            eg [rotation_perm(6, 2)] for rotations by 2 beads,
+               [reflection_perm(6)] for the reflection-only group
+    Output:
+        number of orbits, or list of cosets (sets of tuples)
+
+    The configurations are indexed, and each x is joined to g.x for every
+    generator g in a union-find (disjoint set) structure; the orbits are
+    the resulting components.  This costs O(|configs| x |generators|),
+    and the other elements of the group are never built.
+    """
+    configs = [ pack_config(x) for x in configs ]
+    if not configs:
+        return (list() if return_cosets else 0)
+    n = len(configs[0])
+    if isinstance(generators, str):
+        generators = group_generators(generators, n)
+    index = { x: i for i, x in enumerate(configs) }
+    parent = list(range(len(configs)))
+    size = [1] * len(configs)
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]  # path halving
+            i = parent[i]
+        return i
+
+    num_orbits = len(configs)
+    for g in generators:
+        if sorted(g) != list(range(n)):
+            raise ValueError("generators must be permutations of range(n)")
+        if n <= 1:
+            continue  # only the identity
+        act = itemgetter(*g)
+        for i, x in enumerate(configs):
+            gx = act(x)
+            gx = (bytes(gx) if isinstance(x, bytes) else gx)
+            if gx not in index:
+                raise ValueError("configs are not closed under the group")
+            root_i, root_j = find(i), find(index[gx])
+            if root_i != root_j:
+                if size[root_i] < size[root_j]:
+                    root_i, root_j = root_j, root_i
+                parent[root_j] = root_i
+                size[root_i] += size[root_j]
+                num_orbits -= 1
+
+    if not return_cosets:
+        return num_orbits
+    cosets = dict()  # root -> set of configurations
+    for i, x in enumerate(configs):
+        cosets.setdefault(find(i), set()).add(tuple(x))
+    return list(cosets.values())
+
+
+def rotation_perm(n, k=1):
+    """Permutation rotating n beads by k places, (g.x)[i] = x[(i+k) % n]"""
+    return tuple((i+k) % n for i in range(n))
+
+
+def reflection_perm(n):
+    """Permutation reversing n beads, (g.x)[i] = x[n-1-i]"""
+    return tuple(range(n-1, -1, -1))
+
+
+def group_generators(group, n):
+    """Generators of "Cn" (one rotation) or "Dn" (rotation, reflection)"""
+    if group == "Cn":
+        return [rotation_perm(n)]
+    if group == "Dn":
+        return [rotation_perm(n), reflection_perm(n)]
+    raise ValueError("group must be 'Cn' or 'Dn'")
+
+
 def group_orbit(x, group, n):
     """
     Input:
         x : iterable (tuple, list)
-        group : "Cn" or "Dn"
+        group : "Cn" or "Dn", or list of generator permutations
+            (see mod_group_generators)
         n : len(x), parameter for Cn, Dn
     Output:
         orbit : set of tuples g.x for g in group
     """
+    if not isinstance(group, str):
+        # breadth first search, applying generators until nothing is new
+        orbit = {tuple(x)}
+        frontier = [tuple(x)]
+        while frontier:
+            y = frontier.pop()
+            for g in group:
+                gy = tuple(y[i] for i in g)
+                if gy not in orbit:
+                    orbit.add(gy)
+                    frontier.append(gy)
+        return orbit
     if group not in {"Cn", "Dn"}:
         raise Exception("Incorrect 'group' in 'group_orbit' argument")
     orbit = set()
@@ -9,9 +9,20 @@ Example: palindrome_sequence(22, b=2, stop_length=1000) returns sequence
          of length 1000, of palindrome process for 22 in base 2 (binary);
          numbers in sequence are written in decimal form.
 Comment: Code is very not-optimized for longer sequences.
+         For long runs (eg 196 for millions of iterations), use
+         reverse_add_run, which keeps the number as a NumPy digit buffer
+         (DigitBuffer) and only converts to an int when asked.
 Created on Wed Oct 28 11:02:08 2020
 @author: Corbett Redden
 """
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from math import log2
+import csv
+import os
+import sys
+import numpy as np
 
 default_base = 10
 
@@ -51,4 +62,357 @@ def palindrome_sequence(n, b=default_base, stop_length = 100):
         n = iterate(n,b)
         seq.append(n)
         length += 1
-    return seq
\ No newline at end of file
+    return seq
+
+# Digit-buffer engine for long runs.  Digits are stored little-endian
+# (ones digit first) in a NumPy array with spare capacity.
+
+small_width = 64  # digit count below which conversions use plain loops
+
+@lru_cache(maxsize=None)
+def _power(b, e):
+    """Return b**e, cached (e is a power of 2 in the conversions below)"""
+    return b**e
+
+def _int_to_digits(n, b, width):
+    """Return exactly width base-b digits of n (little-endian) as list"""
+    if width <= small_width:
+        digits = []
+        for i in range(width):
+            n, d = divmod(n, b)
+            digits.append(d)
+        return digits
+    half = 1 << ((width-1).bit_length() - 1)
+    hi, lo = divmod(n, _power(b, half))
+    return _int_to_digits(lo, b, half) + _int_to_digits(hi, b, width-half)
+
+def _digits_to_int(d, b):
+    """Return integer with little-endian base-b digits d"""
+    if len(d) <= small_width:
+        n = 0
+        for digit in d[::-1].tolist():
+            n = n*b + digit
+        return n
+    half = 1 << ((len(d)-1).bit_length() - 1)
+    return _digits_to_int(d[:half], b) + _digits_to_int(d[half:], b)*_power(b, half)
+
+def int_to_digits(n, b=default_base):
+    """
+    Return little-endian base-b digits of natural number n as NumPy array.
+    Divide and conquer (split by b**(2**k)), instead of repeated divmod.
+    """
+    if n < 0:
+        raise ValueError("n must be a natural number")
+    width = int(n.bit_length() / log2(b)) + 1
+    digits = _int_to_digits(n, b, width)
+    while len(digits) > 1 and digits[-1] == 0:
+        digits.pop()
+    return np.array(digits, dtype=(np.uint8 if b <= 256 else np.uint32))
+
+def digits_to_int(d, b=default_base):
+    """Return integer represented by little-endian base-b digit array d"""
+    return _digits_to_int(np.asarray(d, dtype=np.int64), b)
+
+class DigitBuffer:
+    """
+    Natural number stored as base-b digits (little-endian) in a NumPy
+    buffer whose capacity doubles as needed.  reverse_add and
+    is_palindrome work directly on the digits.
+    >>> x = DigitBuffer(57)
+    >>> x.reverse_add(); x.reverse_add(); x.to_int(), x.is_palindrome()
+    (363, True)
+    """
+    def __init__(self, n=0, b=default_base):
+        if b < 2:
+            raise ValueError("base must be at least 2")
+        self.base = b
+        digits = (int_to_digits(n, b) if isinstance(n, int)
+                  else np.asarray(n, dtype=(np.uint8 if b <= 256 else np.uint32)))
+        self.length = len(digits)
+        self.buffer = np.zeros(max(16, 2*self.length), dtype=digits.dtype)
+        self.buffer[:self.length] = digits
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def digits(self):
+        """Little-endian digits (a view into the buffer)"""
+        return self.buffer[:self.length]
+
+    def to_int(self):
+        return digits_to_int(self.digits, self.base)
+
+    def is_palindrome(self):
+        d = self.digits
+        half = self.length // 2
+        return bool(np.array_equal(d[:half], d[::-1][:half]))
+
+    def _grow(self):
+        """Double the capacity of the buffer"""
+        self.buffer = np.concatenate([self.buffer, np.zeros_like(self.buffer)])
+
+    def reverse_add(self):
+        """
+        Replace number by itself plus its mirror image.
+        Carries are vectorized: position j passes a carry on if its digit
+        sum is >= b, stops one if the sum is < b-1, and propagates the
+        incoming carry if the sum is exactly b-1.  The carry into position
+        i is that of the last non-propagating position below i, found
+        with np.maximum.accumulate.
+        """
+        b, length = self.base, self.length
+        d = self.digits
+        s = d.astype(np.int32) + d[::-1]
+        # key 2j+3 (carry out of j) or 2j+2 (no carry) if j is decisive,
+        # else 0; running max gives the key of the last decisive position
+        key = np.where(s != b-1, 2*np.arange(length, dtype=np.int32) + 2, 0)
+        key += (s >= b)
+        np.maximum.accumulate(key, out=key)
+        carry = np.zeros(length+1, dtype=np.int32)
+        np.bitwise_and(key, 1, out=carry[1:])
+        s += carry[:-1]
+        s -= b*(s >= b)
+        if carry[-1]:
+            if length + 1 > len(self.buffer):
+                self._grow()
+            self.buffer[length] = 1
+            self.length += 1
+        self.buffer[:length] = s
+
+class MemmapDigitBuffer(DigitBuffer):
+    """
+    DigitBuffer whose digits live in a memory-mapped file at path, so
+    only the current value is kept and memory use stays flat.  Growing
+    the capacity writes a new file and renames it over the old one.
+    """
+    def __init__(self, path, n=0, b=default_base):
+        digits = DigitBuffer(n, b).digits
+        self.base = b
+        self.path = path
+        self.length = len(digits)
+        self.buffer = np.memmap(path, dtype=digits.dtype, mode="w+",
+                                shape=(max(16, 2*self.length),))
+        self.buffer[:self.length] = digits
+
+    def _grow(self):
+        tmp_path = self.path + ".tmp"
+        new = np.memmap(tmp_path, dtype=self.buffer.dtype, mode="w+",
+                        shape=(2*len(self.buffer),))
+        new[:len(self.buffer)] = self.buffer
+        new.flush()
+        del self.buffer
+        os.replace(tmp_path, self.path)
+        self.buffer = new
+
+def reverse_add_run(n, b=default_base, max_iter=10**6):
+    """
+    Iterate reverse-and-add on n (base b) until a palindrome or max_iter.
+    Return (iterations, reached_palindrome, DigitBuffer of final number);
+    use .to_int() on the last for the integer.
+    Example: reverse_add_run(89)[:2] returns (24, True)
+    """
+    x = (n if isinstance(n, DigitBuffer) else DigitBuffer(n, b))
+    iterations = 0
+    while iterations < max_iter and not x.is_palindrome():
+        x.reverse_add()
+        iterations += 1
+    return iterations, x.is_palindrome(), x
+
+
+# Long runs that survive restarts.  The current value lives in
+# directory/digits.dat (MemmapDigitBuffer); every checkpoint_every
+# iterations the state is written to directory/checkpoint.npz through a
+# temporary file and os.replace, so a checkpoint is never half written.
+
+def _save_checkpoint(directory, x, iteration, start):
+    path = os.path.join(directory, "checkpoint.npz")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as file:
+        np.savez(file, iteration=iteration, base=x.base,
+                 digits=x.digits, start=start)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+def _read_milestones(path, max_iteration):
+    """Milestone rows (iteration, digits) logged up to max_iteration"""
+    if not os.path.exists(path):
+        return []
+    with open(path, newline="") as file:
+        rows = [ (int(i), int(d)) for i, d in list(csv.reader(file))[1:] ]
+    return [ row for row in rows if row[0] <= max_iteration ]
+
+def long_run(n, directory, b=default_base, max_iter=10**6,
+             checkpoint_every=10**4, milestone_digits=None):
+    """
+    Reverse-and-add on n (base b) for up to max_iter total iterations or
+    until a palindrome, resuming from directory/checkpoint.npz if there is
+    one (for the same n and b).  Only the current value is kept, in a
+    memory-mapped file.  If milestone_digits is given, (iteration, digits)
+    is appended to directory/milestones.csv each time the number of
+    digits passes a multiple of milestone_digits; rows after the last
+    checkpoint are dropped on resume, since they are logged again.
+    Return (iterations, reached_palindrome, MemmapDigitBuffer).
+    Example: long_run(196, "run196", max_iter=10**7, milestone_digits=10**4)
+             can be stopped at any time and called again to continue.
+    """
+    os.makedirs(directory, exist_ok=True)
+    checkpoint_path = os.path.join(directory, "checkpoint.npz")
+    digits_path = os.path.join(directory, "digits.dat")
+    milestones_path = os.path.join(directory, "milestones.csv")
+    start = int_to_digits(n, b)
+
+    iteration = 0
+    x = None
+    if os.path.exists(checkpoint_path):
+        with np.load(checkpoint_path) as checkpoint:
+            if int(checkpoint["base"]) != b or not np.array_equal(checkpoint["start"], start):
+                raise ValueError("checkpoint in " + directory + " is for a different run")
+            iteration = int(checkpoint["iteration"])
+            x = MemmapDigitBuffer(digits_path, checkpoint["digits"], b)
+    if x is None:
+        x = MemmapDigitBuffer(digits_path, start, b)
+        _save_checkpoint(directory, x, iteration, start)
+
+    milestone_file = None
+    if milestone_digits:
+        rows = _read_milestones(milestones_path, iteration)
+        with open(milestones_path, "w", newline="") as file:
+            csv.writer(file).writerows([("iteration", "digits")] + rows)
+        milestone_file = open(milestones_path, "a", newline="")
+        milestone_writer = csv.writer(milestone_file)
+        next_milestone = (len(x) // milestone_digits + 1) * milestone_digits
+    try:
+        while iteration < max_iter and not x.is_palindrome():
+            x.reverse_add()
+            iteration += 1
+            if milestone_file is not None and len(x) >= next_milestone:
+                milestone_writer.writerow((iteration, len(x)))
+                next_milestone += milestone_digits
+            if iteration % checkpoint_every == 0:
+                if milestone_file is not None:
+                    milestone_file.flush()
+                _save_checkpoint(directory, x, iteration, start)
+        _save_checkpoint(directory, x, iteration, start)
+    finally:
+        if milestone_file is not None:
+            milestone_file.close()
+    return iteration, x.is_palindrome(), x
+
+
+# Range search for Lychrel candidates.  Many seeds join the same thread
+# (89 and 98 both go to 187), so each process keeps a bounded LRU cache of
+# thread values: (b, value) -> k > 0 if value reaches a palindrome in
+# exactly k iterations, or -m if value, ..., m iterations later are all
+# known to be non-palindromes.
+
+_thread_cache = OrderedDict()
+
+def _mirror(n, b=default_base):
+    """
+    mirror_number, using str for base 10 (much faster) when n is within
+    the int/str conversion limit, and the digit engine for long n
+    """
+    if b == 10:
+        limit = (sys.get_int_max_str_digits() if hasattr(sys, "get_int_max_str_digits")
+                 else 0)
+        # n < 2**bits has fewer than .302*bits + 1 decimal digits
+        if limit == 0 or 0.302 * n.bit_length() + 1 < limit:
+            return int(str(n)[::-1])
+    return digits_to_int(int_to_digits(n, b)[::-1], b)
+
+def _cache_store(key, value, cache_size):
+    old = _thread_cache.get(key)
+    if old is None or (old < 0 and (value > 0 or value < old)):
+        _thread_cache[key] = value
+    _thread_cache.move_to_end(key)
+    while len(_thread_cache) > cache_size:
+        _thread_cache.popitem(last=False)
+
+def lychrel_iterations(n, b=default_base, max_iter=1000, cache_size=10**5):
+    """
+    Return number of reverse-and-add iterations for n to reach a
+    palindrome (base b), or None if there is none in max_iter iterations
+    (n is a Lychrel candidate).  Uses and updates the thread cache.
+    Example: lychrel_iterations(89) returns 24, lychrel_iterations(196)
+             returns None
+    """
+    mirror = _mirror(n, b)
+    if mirror == n:
+        return 0
+    if _mirror(mirror, b) == n:   # no trailing zeros: n, mirror same thread
+        n = min(n, mirror)
+    seen = []
+    value, result, verified = n, None, max_iter
+    for steps in range(max_iter+1):
+        mirror = _mirror(value, b)
+        if mirror == value:
+            result = steps
+            break
+        known = _thread_cache.get((b, value))
+        if known is not None:
+            _thread_cache.move_to_end((b, value))
+            if known > 0:
+                result = steps + known
+                break
+            if steps - known >= max_iter:
+                verified = steps - known
+                break
+        seen.append(value)
+        value += mirror
+    for k, value in enumerate(seen):
+        if result is not None:
+            _cache_store((b, value), result - k, cache_size)
+        elif verified > k:
+            _cache_store((b, value), -(verified - k), cache_size)
+    if result is not None and result > max_iter:
+        return None
+    return result
+
+def _lychrel_chunk(args):
+    """Rows (n, iterations or "candidate") for start <= n < stop"""
+    start, stop, b, max_iter, cache_size = args
+    rows = []
+    for n in range(start, stop):
+        iterations = lychrel_iterations(n, b, max_iter, cache_size)
+        rows.append((n, "candidate" if iterations is None else iterations))
+    return rows
+
+def search_lychrel(start, stop, b=default_base, max_iter=1000, workers=None,
+                   cache_size=10**5, path=None):
+    """
+    For each start <= n < stop, find the number of reverse-and-add
+    iterations to a palindrome, or "candidate" if none in max_iter.
+    The range is split into contiguous chunks run by a pool of workers
+    (default os.cpu_count(); workers=1 runs in this process), each with
+    its own thread cache of at most cache_size values.  Chunks are
+    collected in order.
+    Return list of rows (n, iterations) if path is None, otherwise the rows
+    are streamed to a CSV file at path and the number of rows is returned.
+    Example: search_lychrel(195, 198) returns
+             [(195, 4), (196, 'candidate'), (197, 7)]
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    chunk = max(1, min(10**4, -(-(stop - start) // (4*workers))))
+    args = [ (first, min(first + chunk, stop), b, max_iter, cache_size)
+             for first in range(start, stop, chunk) ]
+    if workers == 1:
+        return _write_lychrel_rows(map(_lychrel_chunk, args), path)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return _write_lychrel_rows(executor.map(_lychrel_chunk, args), path)
+
+def _write_lychrel_rows(row_chunks, path):
+    """Collect rows from iterable of chunks, or stream them to CSV path"""
+    if path is None:
+        return [ row for rows in row_chunks for row in rows ]
+    num_rows = 0
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["n", "iterations"])
+        for rows in row_chunks:
+            writer.writerows(rows)
+            file.flush()
+            num_rows += len(rows)
+    return num_rows
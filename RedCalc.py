@@ -6,8 +6,129 @@ Created on Fri Sep 18 10:24:36 2020
 @author: Corbett Redden
 """
 
-from math import pi
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache, wraps
+from math import pi, fmod, fsum, isfinite
+import heapq
+import json
+import os
+import time
 import warnings
+try:
+    import numpy as np  # only needed for the vectorized routines
+except ImportError:
+    np = None
+
+
+# Instrumentation: inside a "with instrument() as stats:" block, the
+# routines below marked @instrumented record their wall time, and how
+# many times (and at how many points) they evaluate the user's function.
+# Outside such a block the only cost is one check per routine call;
+# the user's function is not wrapped.
+_recorder = None
+
+
+class EvalRecorder:
+    """
+    Statistics collected by instrument(), per routine name:
+        calls : number of (outermost) calls of the routine
+        f_calls : number of calls of the user's function f
+        evals : number of points f was evaluated at (a call of f on an
+            array of 100 points counts 100)
+        wall_time : total time in the routine, in seconds
+        f_time : part of wall_time spent inside f
+    Routines called by other routines (eg simpson_rule inside fnInt) are
+    counted as part of the outermost one.
+    """
+
+    def __init__(self, callback=None):
+        self.stats = dict()
+        self.callback = callback
+        self.active = False
+
+    def record(self, routine):
+        if routine not in self.stats:
+            self.stats[routine] = {"calls": 0, "f_calls": 0, "evals": 0,
+                                   "wall_time": 0., "f_time": 0.}
+        return self.stats[routine]
+
+    def run(self, routine, func, args, kwargs):
+        """Call func(*args, **kwargs), counting evaluations of args[0]"""
+        record = self.record(routine)
+        this_call = {"calls": 1, "f_calls": 0, "evals": 0,
+                     "wall_time": 0., "f_time": 0.}
+        if args and callable(args[0]):
+            args = (self.counted(args[0], this_call),) + tuple(args[1:])
+        self.active = True
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            this_call["wall_time"] = time.perf_counter() - start
+            self.active = False
+            for key in record:
+                record[key] += this_call[key]
+            if self.callback is not None:
+                self.callback(routine, this_call)
+
+    @staticmethod
+    def counted(f, this_call):
+        """Wrap f so each call adds to this_call's counts and f_time"""
+        @wraps(f)
+        def counted_f(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                this_call["f_time"] += time.perf_counter() - start
+                this_call["f_calls"] += 1
+                this_call["evals"] += (int(np.size(args[0]))
+                                       if np is not None and args else 1)
+        counted_f.uncounted = f
+        counted_f.this_call = this_call
+        return counted_f
+
+    def as_dict(self):
+        return { routine: dict(record) for routine, record in self.stats.items() }
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.as_dict(), **kwargs)
+
+
+@contextmanager
+def instrument(callback=None):
+    """
+    Record evaluation counts and timing of RedCalc routines in a block.
+    callback(routine, stats_of_this_call), if given, is called after each
+    instrumented call.
+
+    Example:
+    >>> with instrument() as stats:
+    ...     area = fnInt(lambda x: x**2, 0, 1, N=100)
+    ...     root = bisect_solve(lambda x: x**2, 2, 0, 2)
+    >>> stats.as_dict()["fnInt"]["evals"]
+    101
+    """
+    global _recorder
+    previous = _recorder
+    _recorder = EvalRecorder(callback)
+    try:
+        yield _recorder
+    finally:
+        _recorder = previous
+
+
+def instrumented(func):
+    """ Decorator: record func's calls/evaluations inside instrument() """
+    routine = func.__name__
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if _recorder is None or _recorder.active:
+            return func(*args, **kwargs)
+        return _recorder.run(routine, func, args, kwargs)
+    return wrapper
 
 
 def factorial(n):
@@ -51,40 +172,207 @@ def binomial(alpha, n):
     return product
     
 
-def sqrt_taylor(x, n):
+def series_sum(first_term, ratio, x, n_terms=None, tol=None, max_terms=10**4,
+               divergence_terms=10, full_output=False):
+    """
+    Sum a series t_0 + t_1 + t_2 + ... whose terms satisfy a ratio
+    recurrence t_{k+1} = t_k * ratio(k, x), so each term costs O(1)
+    instead of being recomputed from scratch (eg binomial(.5,k)*(x-1)**k
+    costs O(k), making a degree n sum O(n^2)).
+
+    Parameters
+    ----------
+    first_term : number, or function of x giving t_0
+    ratio : function (k, x) -> t_{k+1}/t_k
+    x : number or NumPy array (all elements are summed in one pass)
+    n_terms : int, optional
+        sum exactly the terms t_0, ..., t_{n_terms - 1} (unless tol
+        stops earlier)
+    tol : float, optional
+        stop once |t_k| < tol (for each element separately)
+    max_terms : int, optional
+        upper bound on number of terms, if n_terms isn't given
+    divergence_terms : int, optional
+        declare the series divergent (eg x outside the radius of
+        convergence) when |t_{k+1}/t_k| >= 1 and hasn't decreased for
+        this many consecutive terms, and give a warning.  If n_terms is
+        given, all n_terms terms are still summed (the partial sum is
+        asked for); otherwise summing stops there.
+    full_output : bool, optional
+        also return the number of terms used and whether it diverged
+
+    Returns
+    -------
+    total, or (total, terms used, diverged) if full_output
+
+    Example: sin(x) = x - x^3/3! + ... has ratio -x^2/((2k+2)(2k+3))
+    >>> series_sum(lambda x: x, lambda k, x: -x*x/((2*k+2)*(2*k+3)), 1., tol=1e-17)
+    0.8414709848078965
+    """
+    vector = np is not None and isinstance(x, np.ndarray)
+    term = (first_term(x) if callable(first_term) else first_term)
+    if vector:
+        term = term*np.ones(x.shape)
+        total = np.zeros(x.shape)
+        used = np.zeros(x.shape, dtype=int)
+        active = np.ones(x.shape, dtype=bool)
+        diverged = np.zeros(x.shape, dtype=bool)
+        streak = np.zeros(x.shape, dtype=int)
+        last_ratio = np.zeros(x.shape)
+    else:
+        total, used, active, diverged, streak, last_ratio = 0., 0, True, False, 0, 0.
+    limit = (n_terms if n_terms != None else max_terms)
+
+    for k in range(limit):
+        if tol != None:
+            active = active & (abs(term) >= tol) if vector else (active and abs(term) >= tol)
+        if not (np.any(active) if vector else active):
+            break
+        if vector:
+            total = total + np.where(active, term, 0.)
+            used = used + active
+        else:
+            total += term
+            used += 1
+        if k == limit-1:
+            break
+        r = ratio(k, x)
+        size = abs(r)
+        # divergence: |ratio| >= 1 and not decreasing, for many terms
+        growing = (size >= 1) & (size >= last_ratio) if vector else (size >= 1 and size >= last_ratio)
+        streak = np.where(growing, streak+1, 0) if vector else (streak+1 if growing else 0)
+        last_ratio = size
+        if vector:
+            new_diverged = active & (streak >= divergence_terms)
+            diverged = diverged | new_diverged
+            if n_terms == None:
+                active = active & ~new_diverged
+        elif active and streak >= divergence_terms:
+            diverged = True
+            if n_terms == None:
+                active = False
+        term = term*r
+
+    if (np.any(diverged) if vector else diverged):
+        warnings.warn("series appears to diverge (outside radius of convergence?)")
+    return ((total, used, diverged) if full_output else total)
+
+
+@instrumented
+def sqrt_taylor(x, n, tol=None, full_output=False):
     """
     Uses a degree n Taylor series, centered at x=1, to 
     approximates sqrt(x).
     Warnings/Questions: Does this always give good answer?
     If it doesn't, what is happening?
+
+    The terms binomial(.5,k)*(x-1)**k are built from each other with
+    ratio (.5-k)/(k+1)*(x-1), see series_sum; with tol, terms smaller
+    than tol are dropped (the sum stops early).  x may be a NumPy array.
+    Outside the radius of convergence (|x-1| > 1) a warning is given, but
+    all n+1 terms are still summed, so the partial sums blow up.
+    If full_output, return (total, terms used, diverged).
     """
-    total=0
-    for k in range(n+1):
-        total += binomial(.5,k)*(x-1)**k
-    return total
+    return series_sum(1., lambda k, x: (.5-k)/(k+1)*(x-1), x, n_terms=n+1,
+                      tol=tol, full_output=full_output)
 
 
-def trig_deg_given_tolerance(tol):
+def trig_deg_given_tolerance(tol, radius=pi):
     """
     Given desired maximal error of sine or cosine, returns smallest 
-    order for the Taylor series that will guarantee such accuracy.
+    order for the Taylor series that will guarantee such accuracy
+    for all |x| <= radius.
     
     Example: accuracy of 1e-8 uses 19th order polynomial
+             (only 10th order for radius=pi/4)
     """        
     k=0
-    while (pi**(k+1))/factorial(k+1) >= tol:
+    bound = radius  # radius**(k+1)/(k+1)!
+    while bound >= tol:
         k += 1
+        bound *= radius/(k+1)
     return k
 
 
+@lru_cache(maxsize=None)
+def trig_coefficients(tolerance=1e-11):
+    """
+    Taylor coefficients used by sin and cos for a given tolerance,
+    computed once and remembered.  Returns (sin_coeffs, cos_coeffs) with
+        sin(r) = r * sum_i sin_coeffs[i] * (r**2)**i
+        cos(r) = sum_i cos_coeffs[i] * (r**2)**i
+    for |r| <= pi/4.  Each coefficient comes from the previous one,
+    eg (-1)**i/(2i)! = -(previous)/((2i-1)(2i)), so no factorials.
+    """
+    poly_deg = trig_deg_given_tolerance(tolerance, pi/4)
+    sin_coeffs, cos_coeffs = [1.], [1.]
+    for i in range(1, poly_deg//2+1):
+        sin_coeffs.append(-sin_coeffs[-1]/((2*i)*(2*i+1)))
+        cos_coeffs.append(-cos_coeffs[-1]/((2*i-1)*(2*i)))
+    return tuple(sin_coeffs), tuple(cos_coeffs)
+
+
+def horner(coeffs, x):
+    """ Evaluate polynomial sum_i coeffs[i]*x**i by Horner's method """
+    total = coeffs[-1]
+    for c in coeffs[-2::-1]:
+        total = total*x + c
+    return total
+
+
+# pi/2 split in two parts, so x - k*pi/2 stays accurate for large k
+pi_over_2_hi = 1.5707963267948966
+pi_over_2_lo = 6.123233995736766e-17
+
+
+def octant_reduce(x):
+    """
+    Return (r, q) with x = r + k*pi/2, |r| <= pi/4 and q = k mod 4.
+    Works elementwise on NumPy arrays.
+    """
+    # beyond 2**30 the two-part pi/2 no longer keeps |r| <= pi/4; reduce
+    # by 2pi first (as mod2pi does - accurate digits are lost there anyway)
+    if np is not None and isinstance(x, np.ndarray):
+        x = np.where(abs(x) > 2**30, np.fmod(x, 2*pi), x)
+        k = np.rint(x/pi_over_2_hi)
+        q = k.astype(np.int64) % 4
+    elif not isfinite(x):
+        return float("nan"), 0  # sin, cos of inf or nan are nan
+    else:
+        if abs(x) > 2**30:
+            x = fmod(x, 2*pi)
+        k = float(round(x/pi_over_2_hi))
+        q = int(k) % 4
+    r = (x - k*pi_over_2_hi) - k*pi_over_2_lo
+    return r, q
+
+
+def sin_cos_reduced(r, q, tolerance=1e-11):
+    """
+    Return (sin(x), cos(x)) for x = r + q*pi/2 (see octant_reduce),
+    using the Taylor polynomials of sin(r) and cos(r) in Horner form.
+    """
+    sin_coeffs, cos_coeffs = trig_coefficients(tolerance)
+    r2 = r*r
+    sin_r = r*horner(sin_coeffs, r2)
+    cos_r = horner(cos_coeffs, r2)
+    # sin(r + q pi/2), cos(r + q pi/2) for q = 0, 1, 2, 3
+    if np is not None and isinstance(r, np.ndarray):
+        sinx = np.choose(q, [sin_r, cos_r, -sin_r, -cos_r])
+        cosx = np.choose(q, [cos_r, -sin_r, -cos_r, sin_r])
+        return sinx, cosx
+    return ((sin_r, cos_r), (cos_r, -sin_r), (-sin_r, -cos_r), (-cos_r, sin_r))[q]
+
+
+@instrumented
 def cos(x, degrees=False, tolerance=1e-11):
     """
-    Return cosine(x), using Taylor series of (x modulo 2pi)
+    Return cosine(x), using Taylor series of (x reduced to [-pi/4,pi/4])
     
     Parameters
     ----------
-    x : float, int
-        input for cos(x).
+    x : float, int or NumPy array
+        input for cos(x). Arrays are evaluated elementwise in one pass.
     deg : bool or string, optional
         If using degrees, use True. The default is False (using radians).
     tolerance : float, optional
@@ -97,36 +385,27 @@ def cos(x, degrees=False, tolerance=1e-11):
     cosx : float
         output cos(x)
     """    
+    if np is not None and isinstance(x, (list, tuple)):
+        x = np.asarray(x, dtype=float)
     # Convert to radian if needed
     if degrees==True or degrees=="deg":    
         x = x*pi/180
     
-    # Determine degree of Taylor polynomial
-    if tolerance==1e-11:  #default tolerance
-        poly_deg = 23
-    else:
-        poly_deg = trig_deg_given_tolerance(tolerance)
-    
-    # # Obtain representative of x in [0,2pi]
-    # x = x%(2*pi)
-    # Obtain representative in [-pi,pi]
-    x = mod2pi(x)
-    
-    # Evaluate Taylor series
-    cosx = 0
-    for i in range(poly_deg//2+1):
-        cosx +=  (-1)**i * (1/factorial(2*i))* x**(2*i)
-    return cosx
+    # Obtain x = r + q*pi/2 with r in [-pi/4,pi/4], then evaluate
+    # Taylor polynomials of sin(r), cos(r) (coefficients are cached)
+    r, q = octant_reduce(x)
+    return sin_cos_reduced(r, q, tolerance)[1]
 
 
+@instrumented
 def sin(x, degrees=False, tolerance=1e-11):
     """ 
-    Return sine(x), using Taylor series of (x modulo 2pi)
+    Return sine(x), using Taylor series of (x reduced to [-pi/4,pi/4])
     
     Parameters
     ----------
-    x : float, int
-        input for cos(x).
+    x : float, int or NumPy array
+        input for sin(x). Arrays are evaluated elementwise in one pass.
     deg : bool or string, optional
         If using degrees, use True. The default is False (using radians).
     tolerance : float, optional
@@ -136,74 +415,392 @@ def sin(x, degrees=False, tolerance=1e-11):
 
     Return sin(x) as float
     """
+    if np is not None and isinstance(x, (list, tuple)):
+        x = np.asarray(x, dtype=float)
     # Convert to radian if needed
     if degrees==True or degrees=="deg":    
         x = x*pi/180
     
-    # Determine degree of Taylor polynomial
-    if tolerance==1e-11:  #default tolerance
-        poly_deg = 23
-    else:
-        poly_deg = trig_deg_given_tolerance(tolerance)
-    
-    # # Obtain representative of x in [0,2pi]
-    # x = x%(2*pi)
-    # Obtain representative in [-pi,pi]
-    x = mod2pi(x)
-    
-    # Evaluate Taylor series
-    sinx = 0
-    for i in range(poly_deg//2+1):
-        sinx +=  (-1)**i * (1/factorial(2*i+1))* x**(2*i+1)
-    return sinx
+    # Obtain x = r + q*pi/2 with r in [-pi/4,pi/4], then evaluate
+    # Taylor polynomials of sin(r), cos(r) (coefficients are cached)
+    r, q = octant_reduce(x)
+    return sin_cos_reduced(r, q, tolerance)[0]
+
+
+def trig_benchmark(num_points=10**5, tolerance=1e-11, x_max=100.):
+    """
+    Compare sin against math.sin and np.sin on num_points random x in
+    [-x_max, x_max].  Returns dict with evaluations per second of each
+    version, and the maximal error of sin (scalar and array versions)
+    compared with math.sin.
+    """
+    import math
+    import random
+    x_list = [ random.uniform(-x_max, x_max) for _ in range(num_points) ]
+    results = dict()
+
+    start = time.perf_counter()
+    y_scalar = [ sin(x, tolerance=tolerance) for x in x_list ]
+    results["sin_per_sec"] = num_points/(time.perf_counter()-start)
+    start = time.perf_counter()
+    y_exact = [ math.sin(x) for x in x_list ]
+    results["math.sin_per_sec"] = num_points/(time.perf_counter()-start)
+    results["sin_max_error"] = max(abs(y-z) for y, z in zip(y_scalar, y_exact))
 
+    if np is not None:
+        x_array = np.array(x_list)
+        start = time.perf_counter()
+        y_array = sin(x_array, tolerance=tolerance)
+        results["sin_array_per_sec"] = num_points/(time.perf_counter()-start)
+        start = time.perf_counter()
+        np.sin(x_array)
+        results["np.sin_per_sec"] = num_points/(time.perf_counter()-start)
+        results["sin_array_max_error"] = float(np.max(abs(y_array - np.array(y_exact))))
+    return results
 
-def nDeriv(f, a, h=.001):
-    """ Numerically compute f'(a) by central method """
+
+@instrumented
+def nDeriv(f, a, h=.001, method="central"):
+    """
+    Numerically compute f'(a) by central method
+    method="richardson" instead extrapolates central differences with
+    shrinking steps, starting from h (see richardson_deriv)
+    """
+    if method == "richardson":
+        return richardson_deriv(f, a, h)
     return (f(a+h)-f(a-h))/(2*h)
 
 
-def bisect_solve(f, rhs, a, b, x_tol=1e-10):
-    """ Solve f(x)=rhs using bisection method """
+@instrumented
+def richardson_deriv(f, a, h=.1, tol=1e-10, max_iter=12, full_output=False):
+    """
+    Numerically compute f'(a) by Richardson extrapolation of central
+    differences D(h), D(h/2), D(h/4), ...  Since D(h) = f'(a) + c1 h^2 +
+    c2 h^4 + ..., each column of the tableau removes one more power of h.
+    The starting step is h, raised to eps**(1/3)*|a| if that is larger
+    (smaller steps would be lost to rounding in a+h), and it is halved
+    until two successive diagonal entries in a row agree to within tol.
+    Requiring two agreements guards against one chance agreement of
+    poor estimates.  If that never happens within max_iter halvings, a
+    warning is given and the entry with the smallest difference is
+    returned.
+    If full_output, return (derivative, error_estimate, evaluations of f).
+    """
+    h = max(h, 2.2e-16**(1/3)*abs(a))
+    row = [ (f(a+h)-f(a-h))/(2*h) ]
+    evals = 2
+    best, best_error = row[0], float("inf")
+    agreements = 0
+    for k in range(1, max_iter+1):
+        h *= .5
+        new_row = [ (f(a+h)-f(a-h))/(2*h) ]
+        evals += 2
+        power = 1
+        for j in range(1, k+1):
+            power *= 4
+            new_row.append(new_row[j-1] + (new_row[j-1]-row[j-1])/(power-1))
+        error = abs(new_row[k] - row[k-1])
+        if error < best_error:
+            best, best_error = new_row[k], error
+        row = new_row
+        agreements = (agreements + 1 if error <= tol*max(1., abs(new_row[k])) else 0)
+        if agreements == 2:
+            best, best_error = new_row[k], error
+            break
+    else:
+        warnings.warn("richardson_deriv did not converge; error estimate "
+                      + str(best_error))
+    return ((best, best_error, evals) if full_output else best)
+
+
+@instrumented
+def grid_deriv(f, a, b, N=100, vectorized=None, full_output=False):
+    """
+    First and second derivatives of f on the grid x_i = a + i*(b-a)/N,
+    i = 0..N, from one evaluation of f per grid point.
+
+    Interior points use central differences
+        f'(x_i) ~ (y[i+1] - y[i-1])/(2dx)
+        f''(x_i) ~ (y[i+1] - 2y[i] + y[i-1])/dx^2
+    and the endpoints use one-sided stencils of the same (second) order.
+    If vectorized, f is called once on the whole grid and NumPy arrays
+    are returned; otherwise lists.  The default None means vectorized
+    only for NumPy ufuncs; "auto" tries f first (see is_vectorized).
+    Returns (x, df, d2f), or (x, df, d2f, evaluations of f) if full_output.
+    """
+    if N < 3:
+        raise ValueError("N must be at least 3")
+    if vectorized == None or vectorized == "auto":
+        vectorized = is_vectorized(f, a, b, probe=(vectorized == "auto"))
+    dx = (b-a)/N
+    if vectorized:
+        x, _ = grid_points(a, b, N, N+1)
+        y = np.asarray(f(x), dtype=float)  # int/bool values would truncate
+        df = np.empty(y.shape)
+        d2f = np.empty(y.shape)
+        df[1:-1] = (y[2:] - y[:-2])/(2*dx)
+        d2f[1:-1] = (y[2:] - 2*y[1:-1] + y[:-2])/dx**2
+    else:
+        x = [ a + i*dx for i in range(N+1) ]
+        y = [ f(x_i) for x_i in x ]
+        df = [0.]*(N+1)
+        d2f = [0.]*(N+1)
+        for i in range(1, N):
+            df[i] = (y[i+1] - y[i-1])/(2*dx)
+            d2f[i] = (y[i+1] - 2*y[i] + y[i-1])/dx**2
+    df[0] = (-3*y[0] + 4*y[1] - y[2])/(2*dx)
+    df[N] = (3*y[N] - 4*y[N-1] + y[N-2])/(2*dx)
+    d2f[0] = (2*y[0] - 5*y[1] + 4*y[2] - y[3])/dx**2
+    d2f[N] = (2*y[N] - 5*y[N-1] + 4*y[N-2] - y[N-3])/dx**2
+    return ((x, df, d2f, N+1) if full_output else (x, df, d2f))
+
+
+@instrumented
+def bisect_solve(f, rhs, a, b, x_tol=1e-10, full_output=False):
+    """
+    Solve f(x)=rhs using bisection method
+
+    f is evaluated once per endpoint and once per midpoint: the sign of
+    f(x)-rhs at an endpoint doesn't change when the endpoint moves, so
+    it never needs to be recomputed.
+    If full_output, return (x, iterations, evaluations of f).
+    """
 
     # Check lower<upper, and f(x)-rhs changes +/- sign
     if a >= b:
         print("upper bound must be > lower bound")
-        return float("nan")
-    if sign(f(a)-rhs) == sign(f(b)-rhs):
+        return ((float("nan"), 0, 0) if full_output else float("nan"))
+    sign_a = sign(f(a)-rhs)
+    sign_b = sign(f(b)-rhs)
+    if sign_a == sign_b:
         print("f(x)-rhs has same sign at endpoints")
-        return float("nan")
+        return ((float("nan"), 0, 2) if full_output else float("nan"))
     
     x = .5*(a + b)
-    y = f(x)
+    sign_x = sign(f(x)-rhs)
+    evals = 3
+    iterations = 0
 
     while .5*(b-a) >= x_tol:
-        if sign(y-rhs) == sign(f(a)-rhs):
+        if sign_x == sign_a:
             a = x
-        elif sign(y-rhs) == sign(f(b)-rhs):
+        elif sign_x == sign_b:
             b = x
-        elif sign(y-rhs) == 0:
-            return x
+        elif sign_x == 0:
+            break
         x = .5*(a+b)
-        y = f(x)
-    return x
+        sign_x = sign(f(x)-rhs)
+        evals += 1
+        iterations += 1
+    return ((x, iterations, evals) if full_output else x)
+
+
+@instrumented
+def illinois_solve(f, rhs, a, b, x_tol=1e-10, max_iter=200, full_output=False):
+    """
+    Solve f(x)=rhs on bracket [a,b] by regula falsi (false position) with
+    the Illinois modification: when the same endpoint is kept twice in a
+    row, its function value is halved, which avoids the slow one-sided
+    convergence of plain regula falsi.  Stops when successive estimates
+    differ by less than x_tol.
+    If full_output, return (x, iterations, evaluations of f).
+    """
+    if a >= b:
+        print("upper bound must be > lower bound")
+        return ((float("nan"), 0, 0) if full_output else float("nan"))
+    fa, fb = f(a)-rhs, f(b)-rhs
+    evals = 2
+    if sign(fa) == sign(fb):
+        print("f(x)-rhs has same sign at endpoints")
+        return ((float("nan"), 0, evals) if full_output else float("nan"))
+    if fa == 0 or fb == 0:
+        x = (a if fa == 0 else b)
+        return ((x, 0, evals) if full_output else x)
+
+    x = a
+    side = 0  # which endpoint was kept last time: -1 = a, +1 = b
+    for iterations in range(1, max_iter+1):
+        x_old = x
+        x = (a*fb - b*fa)/(fb - fa)
+        fx = f(x)-rhs
+        evals += 1
+        if fx == 0 or abs(x-x_old) < x_tol:
+            break
+        if sign(fx) == sign(fb):
+            b, fb = x, fx
+            if side == -1:
+                fa *= .5
+            side = -1
+        else:
+            a, fa = x, fx
+            if side == 1:
+                fb *= .5
+            side = 1
+    return ((x, iterations, evals) if full_output else x)
+
+
+@instrumented
+def brent_solve(f, rhs, a, b, x_tol=1e-10, max_iter=200, full_output=False):
+    """
+    Solve f(x)=rhs on bracket [a,b] by Brent's method: inverse quadratic
+    interpolation or secant steps when they behave, falling back to
+    bisection when they don't, so it is never much slower than bisection
+    and usually converges superlinearly.
+    If full_output, return (x, iterations, evaluations of f).
+    """
+    if a >= b:
+        print("upper bound must be > lower bound")
+        return ((float("nan"), 0, 0) if full_output else float("nan"))
+    fa, fb = f(a)-rhs, f(b)-rhs
+    evals = 2
+    if sign(fa) == sign(fb):
+        print("f(x)-rhs has same sign at endpoints")
+        return ((float("nan"), 0, evals) if full_output else float("nan"))
+
+    eps = 2.220446049250313e-16
+    c, fc = a, fa
+    d = e = b - a
+    for iterations in range(1, max_iter+1):
+        # keep the root between b and c, with b the best estimate so far
+        if sign(fb) == sign(fc):
+            c, fc = a, fa
+            d = e = b - a
+        if abs(fc) < abs(fb):
+            a, b, c = b, c, b
+            fa, fb, fc = fb, fc, fb
+        tol = 2*eps*abs(b) + .5*x_tol
+        m = .5*(c - b)
+        if abs(m) <= tol or fb == 0:
+            break
+        if abs(e) >= tol and abs(fa) > abs(fb):
+            s = fb/fa
+            if a == c:  # secant step
+                p = 2*m*s
+                q = 1 - s
+            else:  # inverse quadratic interpolation
+                q = fa/fc
+                r = fb/fc
+                p = s*(2*m*q*(q - r) - (b - a)*(r - 1))
+                q = (q - 1)*(r - 1)*(s - 1)
+            if p > 0:
+                q = -q
+            else:
+                p = -p
+            if 2*p < min(3*m*q - abs(tol*q), abs(e*q)):
+                e, d = d, p/q
+            else:  # interpolation not good enough, bisect
+                d = e = m
+        else:
+            d = e = m
+        a, fa = b, fb
+        b += (d if abs(d) > tol else (tol if m > 0 else -tol))
+        fb = f(b)-rhs
+        evals += 1
+    return ((b, iterations, evals) if full_output else b)
+
+
+@instrumented
+def root_solve(f, rhs, a, b, x_tol=1e-10, method="brent", full_output=False):
+    """
+    Solve f(x)=rhs on bracket [a,b].  method is "brent" (default),
+    "illinois" or "bisect"; see brent_solve, illinois_solve, bisect_solve.
+    If full_output, return (x, iterations, evaluations of f).
+    """
+    if method == "brent":
+        return brent_solve(f, rhs, a, b, x_tol, full_output=full_output)
+    if method in {"illinois", "regula_falsi"}:
+        return illinois_solve(f, rhs, a, b, x_tol, full_output=full_output)
+    if method in {"bisect", "bisection"}:
+        return bisect_solve(f, rhs, a, b, x_tol, full_output=full_output)
+    raise ValueError("method is unrecognized")
+
+
+@instrumented
+def solve_batch(f, rhs, a, b, x_tol=1e-10, method="illinois", max_iter=200,
+                full_output=False):
+    """
+    Solve f(x)=rhs[i] for a whole array of right hand sides at once,
+    eg to invert a CDF at many quantiles.  f must accept NumPy arrays.
+
+    rhs, a, b : arrays (or numbers), broadcast together; [a[i], b[i]]
+        must bracket the solution of f(x)=rhs[i]
+    method : "illinois" (default) or "bisect"
+    Each iteration calls f once, on the entries that haven't converged.
+    Entries whose bracket has no sign change are nan.
+    x has the broadcast shape of rhs, a, b (a float if all are numbers).
+    If full_output, return (x, iterations, evaluations of f), where
+    evaluations counts every point f was evaluated at.
+    """
+    rhs, a, b = np.broadcast_arrays(np.asarray(rhs, dtype=float),
+                                    np.asarray(a, dtype=float),
+                                    np.asarray(b, dtype=float))
+    shape = a.shape
+    # work on flat copies, so 0-d (all scalar) input can be indexed too
+    rhs, a, b = rhs.ravel(), a.astype(float).ravel(), b.astype(float).ravel()
+    fa, fb = f(a)-rhs, f(b)-rhs
+    evals = 2*a.size
+    x = np.where(fa == 0, a, np.where(fb == 0, b, np.nan))
+    active = (np.sign(fa)*np.sign(fb) < 0)
+    x[active] = a[active]
+    side = np.zeros(a.shape, dtype=int)
+    iterations = 0
+    while np.any(active) and iterations < max_iter:
+        iterations += 1
+        idx = np.nonzero(active)
+        a_i, b_i, fa_i, fb_i = a[idx], b[idx], fa[idx], fb[idx]
+        if method in {"bisect", "bisection"}:
+            x_new = .5*(a_i + b_i)
+        elif method in {"illinois", "regula_falsi"}:
+            x_new = (a_i*fb_i - b_i*fa_i)/(fb_i - fa_i)
+        else:
+            raise ValueError("method is unrecognized")
+        fx = f(x_new) - rhs[idx]
+        evals += x_new.size
+        if method in {"bisect", "bisection"}:
+            done = (.5*(b_i - a_i) < x_tol) | (fx == 0)
+        else:
+            done = (abs(x_new - x[idx]) < x_tol) | (fx == 0)
+        x[idx] = x_new
+
+        # replace the endpoint with the same sign as f(x_new)-rhs
+        same_b = (np.sign(fx) == np.sign(fb_i))
+        side_i = side[idx]
+        b[idx] = np.where(same_b, x_new, b_i)
+        fb[idx] = np.where(same_b, fx, np.where(side_i == 1, .5*fb_i, fb_i))
+        a[idx] = np.where(same_b, a_i, x_new)
+        fa[idx] = np.where(same_b, np.where(side_i == -1, .5*fa_i, fa_i), fx)
+        side[idx] = np.where(same_b, -1, 1)
+        active[tuple(i[done] for i in idx)] = False
+    x = (float(x[0]) if shape == () else x.reshape(shape))
+    return ((x, iterations, evals) if full_output else x)
 
 
-def riemann_sum(f, a, b, N=100, method=.5):
+@instrumented
+def riemann_sum(f, a, b, N=100, method=.5, vectorized=False):
     """
     Calculate and return Riemann sum of f(x) from x=a to x=b
     
     Uses N rectangles (default N=1000)
     Method: 0 - left endpoint; .5 - midpoint; 1 - right endpoints
+    vectorized: evaluate f once on a NumPy grid (see grid_points)
     """
+    if vectorized:
+        x, dx = grid_points(a, b, N, N, method)
+        return np.sum(f(x), axis=-1)*dx
     dx = (b-a)/N
     x_start = a + method*dx
     x_pts = [ x_start + i*dx for i in range(N) ]
     return sum([ f(x) for x in x_pts ])*dx
 
 
-def trap_rule(f, a, b, N=100):
+@instrumented
+def trap_rule(f, a, b, N=100, vectorized=False):
     """ Use trapezoid rule to estimate \int_a^b f(x)dx with N trapezoids """
+    if vectorized:
+        x, dx = grid_points(a, b, N, N+1)
+        weights = np.ones(N+1)
+        weights[[0, -1]] = .5
+        return np.sum(f(x)*weights, axis=-1)*dx
     dx = (b-a)/N
     x_interior = [ a + i*dx for i in range(1,N) ]
     total = ( .5*f(a) + sum([ f(x) for x in x_interior ]) + .5*f(b) )*dx
@@ -211,7 +808,8 @@ def trap_rule(f, a, b, N=100):
     # total = .5*f(a)*dx + sum([ f(x)*dx for x in x_interior ]) + .5*f(b)*dx
 
 
-def simpson_rule(f, a, b, N=50):
+@instrumented
+def simpson_rule(f, a, b, N=50, vectorized=False):
     """
     Approximate the integral of f(x) from a to b by Simpson's rule.
 
@@ -219,10 +817,17 @@ def simpson_rule(f, a, b, N=50):
     (dx/3) ( f(x_0) + 4 \sum_{1< i odd <N} f(x_i) + 
             2 \sum_{1<i even<N} f(x_i) + f(x_N)  )
     where N even, x_i = a + i*dx, and dx = (b - a)/N.
+    vectorized: evaluate f once on a NumPy grid (see grid_points)
     """
     
     if N%2 != 0:
         raise ValueError("N must be an even integer.")
+    if vectorized:
+        x, dx = grid_points(a, b, N, N+1)
+        weights = np.ones(N+1)
+        weights[1:-1:2] = 4
+        weights[2:-1:2] = 2
+        return dx/3 * np.sum(f(x)*weights, axis=-1)
     dx = (b-a)/N    
     x = [ a + i*dx for i in range(N+1) ]
     y_odd = [f(x[i]) for i in range(1, N, 2)]
@@ -235,7 +840,375 @@ def simpson_rule(f, a, b, N=50):
     #             for k in range(1, int(N/2)+1)])*dx/3
 
 
-def fnInt(f, a, b, N=None, dx=1e-2, method="simpson"):
+@instrumented
+def stream_rule(f, a, b, N, rule="simpson", offset=.5, chunk_size=2**16,
+                vectorized=False):
+    """
+    Streaming version of simpson_rule, trap_rule and riemann_sum.
+
+    rule : "simpson", "trap" or "riemann" (offset as in riemann_sum)
+    The grid points are generated chunk_size at a time, each chunk's
+    weighted sum of f values is computed (math.fsum, or NumPy's pairwise
+    sum if vectorized), and the chunk sums are accumulated by Neumaier
+    summation.  Peak memory is O(chunk_size), whatever N is, and the
+    rounding error doesn't grow like N*eps as it does with sum().
+    """
+    dx = (b-a)/N
+    sums = chunk_sums(f, a, dx, N, rule, offset, 0, None, chunk_size, vectorized)
+    total = neumaier_sum(sums)
+    return (dx/3 if rule == "simpson" else dx) * total
+
+
+@instrumented
+def parallel_rule(f, a, b, N, rule="simpson", offset=.5, chunk_size=2**14,
+                  vectorized=False, workers=None, executor=None):
+    """
+    Parallel version of stream_rule, for expensive integrands.
+
+    The grid's chunks (see chunk_sums) are split into contiguous runs,
+    each run's chunk sums are computed in a worker process, and all chunk
+    sums are then added in order by neumaier_sum, exactly as stream_rule
+    does.  Each grid point keeps its global weight (so Simpson's 4, 2
+    pattern is unaffected by the split), and the result is identical to
+    stream_rule with the same chunk_size, however the work is scheduled.
+
+    workers : number of processes (default os.cpu_count()); with an
+        executor, the work is split into about 4*workers tasks
+    executor : optional concurrent.futures executor to use instead;
+        eg a ThreadPoolExecutor when f can't be pickled (a lambda), since
+        a process pool needs f to be a module-level function.
+    """
+    dx = (b-a)/N
+    num_pts = grid_length(N, rule)
+    num_chunks = -(-num_pts // chunk_size)
+    this_call = getattr(f, "this_call", None)  # counts from instrument()
+    f = getattr(f, "uncounted", f)
+    if workers == None:  # also sizes the task split for a given executor
+        workers = os.cpu_count() or 1
+    num_tasks = min(num_chunks, 4*workers)
+    bounds = [ (k*num_chunks)//num_tasks for k in range(num_tasks+1) ]
+    tasks = [ (f, a, dx, N, rule, offset, bounds[k], bounds[k+1], chunk_size,
+               vectorized) for k in range(num_tasks) ]
+    if executor == None:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_chunk_sums_task, tasks))
+    else:
+        results = list(executor.map(_chunk_sums_task, tasks))
+    if this_call is not None:  # f_time isn't measured in the workers
+        this_call["f_calls"] += (num_chunks if vectorized else num_pts)
+        this_call["evals"] += num_pts
+    total = neumaier_sum(s for sums in results for s in sums)
+    return (dx/3 if rule == "simpson" else dx) * total
+
+
+def _chunk_sums_task(args):
+    """Worker for parallel_rule"""
+    return list(chunk_sums(*args))
+
+
+def grid_length(N, rule):
+    """Number of grid points used by a rule with N subintervals"""
+    return (N if rule == "riemann" else N+1)
+
+
+def chunk_sums(f, a, dx, N, rule, offset, first_chunk, last_chunk, chunk_size,
+               vectorized=False):
+    """
+    Yield sum_i w_i f(x_i) over each chunk of grid indices
+    [k*chunk_size, (k+1)*chunk_size), for first_chunk <= k < last_chunk
+    (last_chunk=None: to the end), where x_i = a + (i+offset)*dx and w_i
+    are the rule's weights without the common factor (1, 4, 2, ..., 4, 1
+    for Simpson's rule; 1/2, 1, ..., 1, 1/2 for trapezoid; all 1 for
+    Riemann sums).  Chunks always start at multiples of chunk_size, so
+    any split of the chunks reproduces exactly the same chunk sums.
+    """
+    num_pts = grid_length(N, rule)
+    num_chunks = -(-num_pts // chunk_size)
+    if last_chunk == None or last_chunk > num_chunks:
+        last_chunk = num_chunks
+    for k in range(first_chunk, last_chunk):
+        start = k*chunk_size
+        stop = min(start + chunk_size, num_pts)
+        if vectorized:
+            i = np.arange(start, stop)
+            y = f(a + (i + offset)*dx)
+            if rule == "riemann":
+                yield float(np.sum(y))
+                continue
+            if rule == "simpson":
+                w = np.where(i % 2 == 1, 4., 2.)
+                w[(i == 0) | (i == N)] = 1.
+            else:
+                w = np.ones(stop-start)
+                w[(i == 0) | (i == N)] = .5
+            yield float(np.sum(w*y))
+        else:
+            yield fsum(rule_weight(i, N, rule)*f(a + (i + offset)*dx)
+                       for i in range(start, stop))
+
+
+def rule_weight(i, N, rule):
+    """Weight of grid point i (see chunk_sums)"""
+    if rule == "riemann":
+        return 1
+    if i == 0 or i == N:
+        return (1 if rule == "simpson" else .5)
+    if rule == "simpson":
+        return (4 if i % 2 == 1 else 2)
+    return 1
+
+
+def neumaier_sum(values):
+    """
+    Compensated (Kahan-Babuska-Neumaier) sum of an iterable of floats.
+    The rounding error of each addition is tracked in a separate
+    correction term, so the error doesn't grow with the number of terms.
+    """
+    total = 0.
+    correction = 0.
+    for v in values:
+        t = total + v
+        if abs(total) >= abs(v):
+            correction += (total - t) + v
+        else:
+            correction += (v - t) + total
+        total = t
+    return total + correction
+
+
+@instrumented
+def adaptive_simpson(f, a, b, abs_tol=1e-10, rel_tol=1e-10, max_evals=10**5):
+    """
+    Approximate \int_a^b f(x)dx by adaptive Simpson's rule.
+
+    Each subinterval is estimated by Simpson's rule on it and on its two
+    halves; the difference gives an error estimate (|S2 - S1|/15), and
+    the estimate is improved by Richardson extrapolation.  The subinterval
+    with the largest error estimate is halved, reusing the 5 values of f
+    already computed on it, until the total error estimate is below
+    max(abs_tol, rel_tol*|estimate|) or max_evals would be exceeded.
+    Warning: a spike narrower than the first 5 sample points can be
+    missed entirely (the error estimate is then 0); gauss_kronrod samples
+    15 points per subinterval and is less prone to this.
+
+    Returns (estimate, error_estimate, number of evaluations of f)
+    If a > b, the integral over [b,a] is negated.
+    """
+    if a > b:
+        estimate, error, evals = adaptive_simpson(f, b, a, abs_tol, rel_tol, max_evals)
+        return -estimate, error, evals
+    m = .5*(a+b)
+    fa, fl, fm, fr, fb = f(a), f(.5*(a+m)), f(m), f(.5*(m+b)), f(b)
+
+    def split(interval):
+        a, b, fa, fl, fm, fr, fb = interval
+        m = .5*(a+b)
+        return [_simpson_interval(a, m, fa, f(.5*(a+.5*(a+m))), fl, f(.5*(.5*(a+m)+m)), fm),
+                _simpson_interval(m, b, fm, f(.5*(m+.5*(m+b))), fr, f(.5*(.5*(m+b)+b)), fb)]
+
+    first = _simpson_interval(a, b, fa, fl, fm, fr, fb)
+    return _adaptive_quad(first, split, 4, 5, abs_tol, rel_tol, max_evals)
+
+
+def _simpson_interval(a, b, fa, fl, fm, fr, fb):
+    """(estimate, error, interval) for adaptive_simpson, from 5 values of f"""
+    h = (b-a)/6
+    whole = h*(fa + 4*fm + fb)
+    halves = .5*h*(fa + 4*fl + 2*fm + 4*fr + fb)
+    return halves + (halves-whole)/15, abs(halves-whole)/15, (a, b, fa, fl, fm, fr, fb)
+
+
+# Gauss-Kronrod 7-15 nodes on [-1,1] (positive half) and weights
+# The Gauss nodes are kronrod_nodes[1::2] (odd indices).
+kronrod_nodes = (0.991455371120812639206854697526329, 0.949107912342758524526189684047851,
+                 0.864864423359769072789712788640926, 0.741531185599394439863864773280788,
+                 0.586087235467691130294144845693013, 0.405845151377397166906606412076961,
+                 0.207784955007898467600689403773245, 0.0)
+kronrod_weights = (0.022935322010529224963732008058970, 0.063092092629978553290700663189204,
+                   0.104790010322250183839876322541518, 0.140653259715525918745189590510238,
+                   0.169004726639267902826583426598550, 0.190350578064785409913256402421014,
+                   0.204432940075298892414161999234649, 0.209482141084727828012999174891714)
+gauss_weights = (0.129484966168869693270611432679082, 0.279705391489276667901467771423780,
+                 0.381830050505118944950369775488975, 0.417959183673469387755102040816327)
+
+
+@instrumented
+def gauss_kronrod(f, a, b, abs_tol=1e-10, rel_tol=1e-10, max_evals=10**5,
+                  vectorized=False):
+    """
+    Approximate \int_a^b f(x)dx by adaptive Gauss-Kronrod (7-15) quadrature.
+
+    On each subinterval the 15-point Kronrod rule gives the estimate and
+    its difference from the embedded 7-point Gauss rule is the error
+    estimate.  The subinterval with the largest error is halved until the
+    total error is below max(abs_tol, rel_tol*|estimate|) or max_evals
+    would be exceeded.  With vectorized=True, f is called once per
+    subinterval on an array of its 15 nodes.
+
+    Returns (estimate, error_estimate, number of evaluations of f)
+    If a > b, the integral over [b,a] is negated.
+    """
+    if a > b:
+        estimate, error, evals = gauss_kronrod(f, b, a, abs_tol, rel_tol,
+                                               max_evals, vectorized)
+        return -estimate, error, evals
+
+    def split(interval):
+        a, b = interval
+        m = .5*(a+b)
+        return [_kronrod_interval(f, a, m, vectorized),
+                _kronrod_interval(f, m, b, vectorized)]
+
+    first = _kronrod_interval(f, a, b, vectorized)
+    return _adaptive_quad(first, split, 30, 15, abs_tol, rel_tol, max_evals)
+
+
+def _kronrod_interval(f, a, b, vectorized=False):
+    """(estimate, error, interval) for gauss_kronrod on [a,b]"""
+    center, half = .5*(a+b), .5*(b-a)
+    x = [ center - half*node for node in kronrod_nodes ]
+    x += [ center + half*node for node in kronrod_nodes[-2::-1] ]
+    y = (list(f(np.array(x))) if vectorized else [ f(x_i) for x_i in x ])
+    pairs = [ y[i] + y[14-i] for i in range(7) ]  # f(c-h*node) + f(c+h*node)
+    kronrod = fsum([ kronrod_weights[i]*pairs[i] for i in range(7) ]) \
+        + kronrod_weights[7]*y[7]
+    gauss = fsum([ gauss_weights[i]*pairs[2*i+1] for i in range(3) ]) \
+        + gauss_weights[3]*y[7]
+    return half*kronrod, abs(half)*abs(kronrod-gauss), (a, b)
+
+
+def _adaptive_quad(first, split, split_cost, evals, abs_tol, rel_tol, max_evals):
+    """
+    Shared driver for adaptive_simpson and gauss_kronrod.  Keeps the
+    subintervals in a heap ordered by error estimate and splits the worst
+    one; split(interval) returns two new (estimate, error, interval).
+    """
+    estimate, error, interval = first
+    heap = [(-error, 0, estimate, interval)]
+    finished = []  # intervals too small to split further
+    total, total_error = estimate, error
+    count = 1  # tie breaker, so intervals are never compared
+    while heap and total_error > max(abs_tol, rel_tol*abs(total)):
+        if evals + split_cost > max_evals:
+            warnings.warn("max_evals reached before tolerance was met")
+            break
+        neg_error, _, estimate, interval = heapq.heappop(heap)
+        a, b = interval[0], interval[1]
+        if not a < .5*(a+b) < b:
+            finished.append((estimate, -neg_error))
+            continue
+        total -= estimate
+        total_error += neg_error
+        for estimate, error, interval in split(interval):
+            heapq.heappush(heap, (-error, count, estimate, interval))
+            count += 1
+            total += estimate
+            total_error += error
+        evals += split_cost
+    estimates = [ item[2] for item in heap ] + [ item[0] for item in finished ]
+    errors = [ -item[0] for item in heap ] + [ item[1] for item in finished ]
+    return fsum(estimates), fsum(errors), evals
+
+
+def romberg_iter(f, a, b, max_levels=25, vectorized=False):
+    """
+    Generator of Romberg estimates of \int_a^b f(x)dx.
+
+    Level k uses the trapezoid rule with 2^k subintervals, which is built
+    from level k-1 by evaluating f only at the 2^(k-1) new midpoints, and
+    improves it by Richardson extrapolation (one more row of the Romberg
+    tableau).  Yields (estimate, error_estimate, number of evaluations of
+    f so far) after each level, where the estimate is the newest diagonal
+    entry and the error estimate is its change from the previous one.
+    Callers can stop iterating as soon as the estimate is good enough.
+    """
+    h = b-a
+    row = [ .5*h*(f(a) + f(b)) ]
+    if vectorized:
+        row = [ float(row[0]) ]
+    evals = 2
+    yield row[0], float("inf"), evals
+    for k in range(1, max_levels+1):
+        h *= .5
+        num_new = 2**(k-1)
+        if vectorized:
+            x, _ = grid_points(a+h, b+h, num_new, num_new)
+            new_sum = float(np.sum(f(x)))
+        else:
+            new_sum = fsum([ f(a + (2*i-1)*h) for i in range(1, num_new+1) ])
+        evals += num_new
+        new_row = [ .5*row[0] + h*new_sum ]
+        power = 1
+        for j in range(1, k+1):
+            power *= 4
+            new_row.append(new_row[j-1] + (new_row[j-1]-row[j-1])/(power-1))
+        yield new_row[k], abs(new_row[k]-row[k-1]), evals
+        row = new_row
+
+
+@instrumented
+def romberg(f, a, b, abs_tol=1e-10, rel_tol=1e-10, max_evals=10**5,
+            max_levels=25, vectorized=False):
+    """
+    Approximate \int_a^b f(x)dx by Romberg integration (see romberg_iter),
+    stopping when successive diagonal entries agree to within
+    max(abs_tol, rel_tol*|estimate|), or before exceeding max_evals.
+
+    Returns (estimate, error_estimate, number of evaluations of f)
+    """
+    output = (float("nan"), float("inf"), 0)
+    for output in romberg_iter(f, a, b, max_levels, vectorized):
+        estimate, error, evals = output
+        if error <= max(abs_tol, rel_tol*abs(estimate)):
+            return output
+        if 2*evals - 1 > max_evals:  # next level doubles the evaluations
+            break
+    warnings.warn("Romberg integration stopped before tolerance was met")
+    return output
+
+
+def grid_points(a, b, N, num_pts, offset=0):
+    """
+    NumPy grid x_i = a + (i+offset)*dx, i = 0..num_pts-1, dx = (b-a)/N.
+
+    a, b may be numbers or arrays of bounds (of the same shape); the grid
+    then has one row per pair (a, b), ie shape a.shape + (num_pts,), and
+    dx has shape a.shape, so that a single call to f evaluates every grid.
+    """
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    dx = (b-a)/N
+    x = a[..., None] + (np.arange(num_pts) + offset)*dx[..., None]
+    return x, dx
+
+
+def is_vectorized(f, a=0., b=1., probe=False):
+    """
+    Guess whether f can be called on a NumPy array and returns an array
+    of the same shape (eg NumPy ufuncs, or polynomials written with +,*,**)
+    Only NumPy ufuncs are recognized unless probe=True, in which case f is
+    also tried on 3 points of [a,b] (3 extra, uncounted calls of f).
+    """
+    if np is None:
+        return False
+    if isinstance(f, np.ufunc):
+        return True
+    if not probe:
+        return False
+    x = np.linspace(np.min(a), np.max(b), 3)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            y = f(x)
+    except Exception:
+        return False
+    return isinstance(y, np.ndarray) and y.shape == x.shape
+
+
+@instrumented
+def fnInt(f, a, b, N=None, dx=1e-2, method="simpson", vectorized=None,
+          abs_tol=1e-10, rel_tol=1e-10, max_evals=10**5, full_output=False,
+          chunk_size=None, workers=None, executor=None):
     """
     Numerically calculate \int_a^b f(x)dx
     
@@ -243,8 +1216,10 @@ def fnInt(f, a, b, N=None, dx=1e-2, method="simpson"):
     ----------
     f : function
         function of single variable to be integrated
-    a, b : numbers
+    a, b : numbers, or arrays of numbers
         left, right bounds of integration; forms interval [a,b]
+        If arrays (of the same shape), an integral is computed for each
+        pair (a, b) and an array of results is returned.
     N : integer, optional
         number of rectangles, i.e. n+1 x-values. 
         Default=None, which calculates based on dx        
@@ -258,6 +1233,32 @@ def fnInt(f, a, b, N=None, dx=1e-2, method="simpson"):
             "mid" : midpoint rule
             "trap" : trapezoid rule
             "simpson" or "simp" : Simpsons's Rule (default)
+            "adaptive_simpson" : adaptive Simpson's Rule
+            "gauss_kronrod" or "gk" : adaptive Gauss-Kronrod (7-15)
+            "romberg" : Romberg integration
+        The adaptive methods and Romberg ignore N, dx and instead use
+        abs_tol, rel_tol, max_evals (see adaptive_simpson, gauss_kronrod,
+        romberg).
+    vectorized : bool, optional
+        True: f accepts NumPy arrays, so it is called once on the whole
+        grid (requires NumPy).  False: f is called once per x-value.
+        The default None is True only for NumPy ufuncs; "auto" decides
+        by trying f on 3 points (see is_vectorized).
+    abs_tol, rel_tol : float, optional
+        Error tolerances for adaptive methods. The defaults are 1e-10.
+    max_evals : int, optional
+        Maximal number of evaluations of f for adaptive methods.
+    full_output : bool, optional
+        If True, return (estimate, error_estimate, number of evaluations);
+        error_estimate is None for the fixed-grid methods.
+    chunk_size : int, optional
+        If given, the fixed-grid methods run in streaming mode (see
+        stream_rule): the grid is generated chunk_size points at a time
+        and summed with compensation, so memory doesn't grow with N.
+    workers, executor : optional
+        If either is given, the fixed-grid methods evaluate f in parallel
+        (see parallel_rule; by default with chunk_size=2**14).  The result
+        doesn't depend on the number of workers or on scheduling.
         
     Returns
     -------
@@ -270,14 +1271,29 @@ def fnInt(f, a, b, N=None, dx=1e-2, method="simpson"):
     fnInt(cos, 0, 2)
     fnInt(lambda x:x**2, -1, 14.5, N=10)
     fnInt(lambda x: x**5-1, 2.1, 3.1, dx=.1, method="left")
+    fnInt(np.sin, 0, np.linspace(0, pi, 1000), N=10**4)
+
+    Reversed bounds give the negative, for every method:
+    >>> round(fnInt(lambda x: x**2, 3, 0), 10)
+    -9.0
+    >>> estimate, error, evals = fnInt(lambda x: x**2, 3, 0, method="gk", full_output=True)
+    >>> round(estimate, 10), error >= 0
+    (-9.0, True)
+    >>> round(fnInt(lambda x: x**2, 3, 0, method="adaptive_simpson"), 10)
+    -9.0
     """
 
     # Exception handling
     if not callable(f):
         raise TypeError("f must be a function")
+    batch = np is not None and (np.ndim(a) > 0 or np.ndim(b) > 0)
     try:
-        a = float(a)
-        b = float(b)
+        if batch:
+            a, b = np.broadcast_arrays(np.asarray(a, dtype=float),
+                                       np.asarray(b, dtype=float))
+        else:
+            a = float(a)
+            b = float(b)
     except:
         raise TypeError("a,b must be numbers")
     if N != None and type(N) != int:
@@ -287,25 +1303,68 @@ def fnInt(f, a, b, N=None, dx=1e-2, method="simpson"):
     except:
         raise TypeError("dx must be a number")
     
-    # Determine N
+    # Determine N (for arrays of bounds, based on the longest interval)
     if N == None:
-        N = int( abs( (b-a)/dx ) )
+        N = int( abs( (b-a)/dx ) ) if not batch else int(np.max(abs(b-a))/dx)
+
+    if vectorized == None or vectorized == "auto":
+        vectorized = is_vectorized(f, a, b, probe=(vectorized == "auto"))
+    adaptive = method in {"adaptive_simpson", "adaptive", "gauss_kronrod", "gk",
+                          "romberg"}
+    parallel = workers != None or executor != None
+    if batch and (adaptive or not vectorized or chunk_size != None or parallel):
+        # integrate one pair of bounds at a time with the scalar path
+        results = [ fnInt(f, a_i, b_i, N, dx, method, vectorized, abs_tol,
+                          rel_tol, max_evals, full_output, chunk_size,
+                          workers, executor)
+                    for a_i, b_i in zip(a.ravel(), b.ravel()) ]
+        if full_output:
+            return results
+        return np.array(results).reshape(a.shape)
 
-    # Call specific integration function based on method
+    # Adaptive methods don't use a fixed grid
+    if adaptive:
+        if method in {"adaptive_simpson", "adaptive"}:
+            output = adaptive_simpson(f, a, b, abs_tol, rel_tol, max_evals)
+        elif method == "romberg":
+            output = romberg(f, a, b, abs_tol, rel_tol, max_evals,
+                             vectorized=vectorized)
+        else:
+            output = gauss_kronrod(f, a, b, abs_tol, rel_tol, max_evals,
+                                   vectorized)
+        return (output if full_output else output[0])
+
+    # Determine the rule: Simpson, trapezoid, or Riemann sum with offset
     if method in {"simp", "simpson", "Simp", "Simpson", "simpsons", "Simpsons",
                   "simpsons_rule","simpson_rule"}:
         if N%2 == 1:  
             warnings.warn("N was odd, so using N+1 for Simpson's Rule")
             N += 1
-        return simpson_rule(f, a, b, N)
-    if method in {"trap", "trapezoid", "trapz", "trapezoid_rule"}:
-        return trap_rule(f, a, b, N)
+        rule, offset = "simpson", 0
+    elif method in {"trap", "trapezoid", "trapz", "trapezoid_rule"}:
+        rule, offset = "trap", 0
     elif method in {"left", "l", "L"}:
-        return riemann_sum(f, a, b, N, 0)
+        rule, offset = "riemann", 0
     elif method in {"mid", "midpoint"}:
-        return riemann_sum(f, a, b, N, .5)
+        rule, offset = "riemann", .5
     elif method in {"right", "r", "R"}:
-        return riemann_sum(f, a, b, N, 1)
+        rule, offset = "riemann", 1
     else:
         raise ValueError("method is unrecognized")
+    num_evals = (N if rule == "riemann" else N+1)
 
+    # Call specific integration function based on rule
+    if parallel:
+        result = parallel_rule(f, a, b, N, rule, offset, chunk_size or 2**14,
+                               vectorized, workers, executor)
+    elif chunk_size != None:
+        result = stream_rule(f, a, b, N, rule, offset, chunk_size, vectorized)
+    elif rule == "simpson":
+        result = simpson_rule(f, a, b, N, vectorized)
+    elif rule == "trap":
+        result = trap_rule(f, a, b, N, vectorized)
+    else:
+        result = riemann_sum(f, a, b, N, offset, vectorized)
+    if vectorized and not batch:
+        result = float(result)
+    return ((result, None, num_evals) if full_output else result)